@@ -0,0 +1,80 @@
+"""
+Convert the decision paths stored by previous versions of KGTORe (TSV and pickle files) into the decision path
+cache of a dataset split, under the key KGTORe computes for it.
+
+    python convert_decision_paths.py config_files/facebook_kgtore.yml decision_path20_entropy.tsv item_features20_entropy.pk
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+from os import path
+
+from elliot.namespace.namespace_model_builder import NameSpaceBuilder
+
+here = path.abspath(path.join(path.dirname(__file__), 'elliot'))
+
+
+def load_external(base):
+    # as run_experiment does, so that the external models can be imported
+    spec = importlib.util.spec_from_file_location("external", path.relpath(base.external_models_path))
+    external = importlib.util.module_from_spec(spec)
+    external.backend = base.backend
+    sys.modules[spec.name] = external
+    spec.loader.exec_module(external)
+
+
+def kgtore_params(builder):
+    for key, model_base in builder.models():
+        if key == "external.KGTORE":
+            return model_base[0] if isinstance(model_base, tuple) else model_base
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert KGTORe TSV decision paths to the decision path cache.")
+    parser.add_argument('config', type=str, help='experiment configuration of the dataset')
+    parser.add_argument('path', type=str, help='decision path TSV [user, item, feature, val, interaction]')
+    parser.add_argument('item_features_path', type=str, help='pickled item features')
+    parser.add_argument('--npr', type=int, default=None, help='npr of the decision paths (default: from the config)')
+    parser.add_argument('--criterion', type=str, default=None,
+                        help='criterion of the decision paths (default: from the config)')
+    parser.add_argument('--test_fold', type=int, default=0)
+    parser.add_argument('--train_fold', type=int, default=0)
+    args = parser.parse_args()
+
+    builder = NameSpaceBuilder(args.config, here, path.abspath(path.dirname(args.config)))
+    base = builder.base.base_namespace
+    params = kgtore_params(builder)
+    if params is None:
+        raise Exception(f"No external.KGTORE model in {args.config}")
+    npr = args.npr if args.npr is not None else getattr(params, "npr", 10)
+    criterion = args.criterion if args.criterion is not None else getattr(params, "criterion", "entropy")
+    if isinstance(npr, list) or isinstance(criterion, list):
+        raise Exception("npr and criterion are explored in the config: set the ones of the decision paths "
+                        "with --npr and --criterion")
+    loader = getattr(params, "loader", "KGTORETSVLoader")
+    shared_features = getattr(params.meta, "shared_features", False)
+
+    load_external(base)
+    from external.models.kgtore.DecisionPathsCache import DecisionPathsCache
+    from external.models.kgtore.LoadEdgeFeatures import convert_tsv
+
+    dataloader_class = getattr(importlib.import_module("elliot.dataset"), base.data_config.dataloader)
+    data = dataloader_class(config=base).generate_dataobjects()[args.test_fold][args.train_fold]
+    side = getattr(data.side_information, loader)
+
+    # same cache as the model
+    cache = DecisionPathsCache(os.path.join('./data', base.dataset, 'kgtore', 'cache'), data, side.feature_map,
+                               npr=npr, criterion=criterion, shared_features=shared_features)
+    if cache.exists():
+        print(f'Decision paths already cached at {cache.path}')
+        return
+    edge_features, item_features = convert_tsv(args.path, args.item_features_path, data.sp_i_train)
+    cache.store(edge_features, item_features, converted_from=path.abspath(args.path))
+    print(f'Converted {args.path} to {cache.path}')
+
+
+if __name__ == '__main__':
+    main()
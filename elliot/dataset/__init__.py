@@ -7,9 +7,25 @@ __version__ = '0.3.1'
 __author__ = 'Vito Walter Anelli, Claudio Pomo'
 __email__ = 'vitowalter.anelli@poliba.it, claudio.pomo@poliba.it'
 
-from elliot.dataset.dataset import DataSetLoader, DataSet
-from elliot.dataset.dataloader.knowledge_aware_chains import KnowledgeChainsLoader
-from elliot.dataset.dataloader.visual_dataloader import VisualLoader
-from elliot.dataset.dataloader.item_category_dataloader import ItemCategoryLoader
-from elliot.dataset.modular_loaders.kg.kahfm_kgrec import KAHFMLoader
-from elliot.dataset.modular_loaders.kg.kgrec_torealbzeus import KGZeus
+from elliot.utils.lazy_import import lazy_getattr
+
+# data loaders are imported when the configuration asks for them
+__getattr__ = lazy_getattr(__name__, {
+    "DataSetLoader": "elliot.dataset.dataset.DataSetLoader",
+    "DataSet": "elliot.dataset.dataset.DataSet",
+    "KnowledgeChainsLoader": "elliot.dataset.dataloader.knowledge_aware_chains.KnowledgeChainsLoader",
+    "VisualLoader": "elliot.dataset.dataloader.visual_dataloader.VisualLoader",
+    "ItemCategoryLoader": "elliot.dataset.dataloader.item_category_dataloader.ItemCategoryLoader",
+    "KAHFMLoader": "elliot.dataset.modular_loaders.kg.kahfm_kgrec.KAHFMLoader",
+    "KGZeus": "elliot.dataset.modular_loaders.kg.kgrec_torealbzeus.KGZeus",
+    "ChainedKG": "elliot.dataset.modular_loaders.kg.kahfm_style.ChainedKG",
+    "ItemAttributes": "elliot.dataset.modular_loaders.generic.item_attributes.ItemAttributes",
+    "KGCompletion": "elliot.dataset.modular_loaders.kg.minervini_style.KGCompletion",
+    "UserUser": "elliot.dataset.modular_loaders.generic.user_user.UserUser",
+    "ItemItem": "elliot.dataset.modular_loaders.generic.item_item.ItemItem",
+    "KGRec": "elliot.dataset.modular_loaders.kg.kgrec.KGRec",
+    "KGFlexLoader": "elliot.dataset.modular_loaders.kg.kgflex.KGFlexLoader",
+    "KGINLoader": "elliot.dataset.modular_loaders.kg.kgin.KGINLoader",
+    "KGINTSVLoader": "elliot.dataset.modular_loaders.kg.kgin_tsv.KGINTSVLoader",
+    "KGTORETSVLoader": "elliot.dataset.modular_loaders.kg.kgtore_tsv.KGTORETSVLoader",
+})
@@ -0,0 +1,65 @@
+"""
+Module description:
+
+"""
+
+__version__ = '0.3.1'
+
+import numpy as np
+import scipy.sparse as sp
+
+
+class CandidateMask:
+    """
+    Users x items boolean mask of the candidate items, backed by a CSR matrix.
+
+    Slicing a range of users returns the dense block of those users only,
+    while the dense users x items array is built only on explicit request (np.asarray(mask)).
+    """
+
+    def __init__(self, sp_matrix, candidates=True):
+        """
+        :param sp_matrix: users x items sparse matrix
+        :param candidates: if True the stored entries are the candidate items,
+        otherwise they are the excluded ones (e.g. the training items)
+        """
+        self._sp = sp.csr_matrix(sp_matrix, dtype=bool)
+        self._sp.sum_duplicates()
+        self.candidates = candidates
+        self.shape = self._sp.shape
+
+    def indices(self, offset, offset_stop):
+        """
+        :return: (rows, cols) of the stored entries of the given users, rows are relative to offset
+        """
+        indptr = self._sp.indptr[offset: offset_stop + 1]
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        return rows, self._sp.indices[indptr[0]: indptr[-1]]
+
+    def mask(self, scores, offset, offset_stop, value=-np.inf):
+        """
+        Set to value the scores of the non-candidate items, scattering over the CSR indices
+        :param scores: (offset_stop - offset) x items numpy array or torch tensor
+        :return: masked copy of scores
+        """
+        rows, cols = self.indices(offset, offset_stop)
+        masked = scores.clone() if hasattr(scores, 'clone') else scores.copy()
+        if self.candidates:
+            masked[:] = value
+            masked[rows, cols] = scores[rows, cols]
+        else:
+            masked[rows, cols] = value
+        return masked
+
+    def __getitem__(self, key):
+        block = self._sp[key]
+        if sp.issparse(block):
+            block = block.toarray()
+            # a single user gives its row, as with a dense mask
+            if isinstance(key, (int, np.integer)):
+                block = block[0]
+        return block if self.candidates else ~block
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self[:]
+        return dense if dtype is None else dense.astype(dtype)
@@ -23,6 +23,7 @@ from PIL import Image
 from elliot.prefiltering.standard_prefilters import PreFilter
 from elliot.splitter.base_splitter import Splitter
 from elliot.utils import logging
+from elliot.dataset.candidate_mask import CandidateMask
 
 """
 [(train_0,test_0)]
@@ -378,7 +379,7 @@ class VisualDataObject:
             self.val_dict = self.build_dict(data_tuple[1], self.users)
             self.test_dict = self.build_dict(data_tuple[2], self.users)
 
-        self.allunrated_mask = np.where((self.sp_i_train.toarray() == 0), True, False)
+        self.allunrated_mask = CandidateMask(self.sp_i_train, candidates=False)
 
     def read_images(self, images_folder, image_set, size_tuple):
         image_dict = {}
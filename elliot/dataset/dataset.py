@@ -22,6 +22,7 @@ from elliot.splitter.base_splitter import Splitter
 from elliot.prefiltering.standard_prefilters import PreFilter
 from elliot.negative_sampling.negative_sampling import NegativeSampler
 from elliot.utils import logging
+from elliot.dataset.candidate_mask import CandidateMask
 
 from elliot.dataset.modular_loaders.loader_coordinator_mixin import LoaderCoordinator
 
@@ -204,13 +205,20 @@ class DataSet(AbstractDataset):
         else:
             self.side_information = side_information_data
 
-        self.train_dict = self.dataframe_to_dict(data_tuple[0])
+        # the training interactions are kept as columns grouped by user,
+        # train_dict and i_train_dict are built from them only if they are requested
+        users, self._train_indptr, self._train_items, self._train_ratings = self.group_by_user(data_tuple[0])
+        self._train_dict = None
+        self._i_train_dict = None
 
-        self.users = list(self.train_dict.keys())
-        self.items = list({k for a in self.train_dict.values() for k in a.keys()})
+        self.users = users.tolist()
+        # the items are listed as the set of the train items used to be, which fixes the private item ids
+        self.items = list(set(pd.unique(self._train_items).tolist()))
         self.num_users = len(self.users)
         self.num_items = len(self.items)
-        self.transactions = sum(len(v) for v in self.train_dict.values())
+        self._train_item_ids = pd.Index(self.items).get_indexer(self._train_items)
+        self._train_entries = self.last_entries()
+        self.transactions = len(self._train_entries)
 
         sparsity = 1 - (self.transactions / (self.num_users * self.num_items))
         self.logger.info(
@@ -222,9 +230,6 @@ class DataSet(AbstractDataset):
         self.private_items = {p: i for p, i in enumerate(self.items)}
         self.public_items = {v: k for k, v in self.private_items.items()}
 
-        self.i_train_dict = {self.public_users[user]: {self.public_items[i]: v for i, v in items.items()}
-                             for user, items in self.train_dict.items()}
-
         self.sp_i_train = self.build_sparse()
         self.sp_i_train_ratings = self.build_sparse_ratings()
 
@@ -236,7 +241,7 @@ class DataSet(AbstractDataset):
                                                                            self.sp_i_train, None, self.test_dict)
                 sp_i_test = self.to_bool_sparse(self.test_dict)
                 test_candidate_items = test_neg_samples + sp_i_test
-                self.test_mask = np.where((test_candidate_items.toarray() == True), True, False)
+                self.test_mask = CandidateMask(test_candidate_items)
         else:
             self.val_dict = self.build_dict(data_tuple[1], self.users)
             self.test_dict = self.build_dict(data_tuple[2], self.users)
@@ -248,11 +253,11 @@ class DataSet(AbstractDataset):
                 sp_i_val = self.to_bool_sparse(self.val_dict)
                 sp_i_test = self.to_bool_sparse(self.test_dict)
                 val_candidate_items = val_neg_samples + sp_i_val
-                self.val_mask = np.where((val_candidate_items.toarray() == True), True, False)
+                self.val_mask = CandidateMask(val_candidate_items)
                 test_candidate_items = test_neg_samples + sp_i_test
-                self.test_mask = np.where((test_candidate_items.toarray() == True), True, False)
+                self.test_mask = CandidateMask(test_candidate_items)
 
-        self.allunrated_mask = np.where((self.sp_i_train.toarray() == 0), True, False)
+        self.allunrated_mask = CandidateMask(self.sp_i_train, candidates=False)
 
     def build_items_neighbour(self):
         row, col = self.sp_i_train.nonzero()
@@ -261,45 +266,70 @@ class DataSet(AbstractDataset):
                    enumerate(list((edge_index[1] == i).nonzero()[0] for i in list(self.private_items.keys())))}
         return iu_dict
 
-    def dataframe_to_dict(self, data):
-        users = list(data['userId'].unique())
+    @property
+    def train_dict(self):
+        if self._train_dict is None:
+            self._train_dict = self.columns_to_dict(self.users, self._train_indptr, self._train_items,
+                                                    self._train_ratings)
+        return self._train_dict
+
+    @property
+    def i_train_dict(self):
+        if self._i_train_dict is None:
+            self._i_train_dict = self.columns_to_dict(range(self.num_users), self._train_indptr,
+                                                      self._train_item_ids, self._train_ratings)
+        return self._i_train_dict
+
+    @staticmethod
+    def group_by_user(data):
+        """
+        Sort the interactions by user, keeping their order within each user
+        :param data: dataframe with userId, itemId and rating columns
+        :return: sorted users, CSR pointers to the interactions of each user, items and ratings of the interactions
+        """
+        user_ids, users = pd.factorize(data['userId'], sort=True)
+        order = np.argsort(user_ids, kind='stable')
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(user_ids, minlength=len(users)))])
+        # items are read together with the ratings, as in the former row by row conversion
+        items = data[['itemId', 'rating']].to_numpy()[order, 0]
+        ratings = data['rating'].to_numpy(dtype=float)[order]
+        return users, indptr, items, ratings
+
+    @staticmethod
+    def columns_to_dict(users, indptr, items, ratings):
+        """
+        :return: {user: {item: rating}}, where a repeated item keeps its first position and its last rating
+        """
+        items, ratings, indptr = items.tolist(), ratings.tolist(), indptr.tolist()
+        return {u: dict(zip(items[start:stop], ratings[start:stop]))
+                for u, start, stop in zip(users, indptr[:-1], indptr[1:])}
 
-        "Conversion to Dictionary"
-        ratings = data.set_index('userId')[['itemId', 'rating']].apply(lambda x: (x['itemId'], float(x['rating'])), 1)\
-            .groupby(level=0).agg(lambda x: dict(x.values)).to_dict()
-        # for u in users:
-        #     sel_ = data[data['userId'] == u]
-        #     ratings[u] = dict(zip(sel_['itemId'], sel_['rating']))
-        return ratings
+    def dataframe_to_dict(self, data):
+        return self.columns_to_dict(*self.group_by_user(data))
 
     def build_dict(self, dataframe, users):
-        ratings = dataframe.set_index('userId')[['itemId', 'rating']].apply(lambda x: (x['itemId'], float(x['rating'])), 1)\
-            .groupby(level=0).agg(lambda x: dict(x.values)).to_dict()
-        # for u in users:
-        #     sel_ = dataframe[dataframe['userId'] == u]
-        #     ratings[u] = dict(zip(sel_['itemId'], sel_['rating']))
-        return ratings
+        return self.dataframe_to_dict(dataframe)
 
-    def build_sparse(self):
-
-        rows_cols = [(u, i) for u, items in self.i_train_dict.items() for i in items.keys()]
-        rows = [u for u, _ in rows_cols]
-        cols = [i for _, i in rows_cols]
-        data = sp.csr_matrix((np.ones_like(rows), (rows, cols)), dtype='float32',
-                             shape=(len(self.users), len(self.items)))
-        return data
-
-    def build_sparse_ratings(self):
-        rows_cols_ratings = [(u, i, r) for u, items in self.i_train_dict.items() for i, r in items.items()]
-        rows = [u for u, _, _ in rows_cols_ratings]
-        cols = [i for _, i, _ in rows_cols_ratings]
-        ratings = [r for _, _, r in rows_cols_ratings]
+    def last_entries(self):
+        """
+        :return: positions of the last interaction of each (user, item) pair, sorted by user and item
+        """
+        user_ids = np.repeat(np.arange(self.num_users), np.diff(self._train_indptr))
+        keys = user_ids * self.num_items + self._train_item_ids
+        _, last = np.unique(keys[::-1], return_index=True)
+        return len(keys) - 1 - last
 
-        data = sp.csr_matrix((ratings, (rows, cols)), dtype='float32',
+    def build_sparse(self):
+        return self.build_sparse_ratings(np.ones(self.transactions))
+
+    def build_sparse_ratings(self, ratings=None):
+        entries = self._train_entries
+        # the entries of each user lie within its own range of positions
+        indptr = np.searchsorted(entries, self._train_indptr)
+        ratings = self._train_ratings[entries] if ratings is None else ratings
+        return sp.csr_matrix((ratings.astype('float32'), self._train_item_ids[entries], indptr),
                              shape=(len(self.users), len(self.items)))
 
-        return data
-
     def get_test(self):
         return self.test_dict
 
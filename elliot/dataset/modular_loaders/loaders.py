@@ -1,11 +1,16 @@
-from elliot.dataset.modular_loaders.kg.kahfm_style import ChainedKG
-from elliot.dataset.modular_loaders.generic.item_attributes import ItemAttributes
-from elliot.dataset.modular_loaders.kg.minervini_style import KGCompletion
-from elliot.dataset.modular_loaders.generic.user_user import UserUser
-from elliot.dataset.modular_loaders.generic.item_item import ItemItem
-from elliot.dataset.modular_loaders.kg.kgrec import KGRec
-from elliot.dataset.modular_loaders.kg.kgflex import KGFlexLoader
-from elliot.dataset.modular_loaders.kg.kahfm_kgrec import KAHFMLoader
-from elliot.dataset.modular_loaders.kg.kgin import KGINLoader
-from elliot.dataset.modular_loaders.kg.kgin_tsv import KGINTSVLoader
-from elliot.dataset.modular_loaders.kg.kgtore_tsv import KGTORETSVLoader
+from elliot.utils.lazy_import import lazy_getattr
+
+# side information loaders are imported when the configuration asks for them
+__getattr__ = lazy_getattr(__name__, {
+    "ChainedKG": "elliot.dataset.modular_loaders.kg.kahfm_style.ChainedKG",
+    "ItemAttributes": "elliot.dataset.modular_loaders.generic.item_attributes.ItemAttributes",
+    "KGCompletion": "elliot.dataset.modular_loaders.kg.minervini_style.KGCompletion",
+    "UserUser": "elliot.dataset.modular_loaders.generic.user_user.UserUser",
+    "ItemItem": "elliot.dataset.modular_loaders.generic.item_item.ItemItem",
+    "KGRec": "elliot.dataset.modular_loaders.kg.kgrec.KGRec",
+    "KGFlexLoader": "elliot.dataset.modular_loaders.kg.kgflex.KGFlexLoader",
+    "KAHFMLoader": "elliot.dataset.modular_loaders.kg.kahfm_kgrec.KAHFMLoader",
+    "KGINLoader": "elliot.dataset.modular_loaders.kg.kgin.KGINLoader",
+    "KGINTSVLoader": "elliot.dataset.modular_loaders.kg.kgin_tsv.KGINTSVLoader",
+    "KGTORETSVLoader": "elliot.dataset.modular_loaders.kg.kgtore_tsv.KGTORETSVLoader",
+})
@@ -0,0 +1,62 @@
+"""
+Module description:
+
+"""
+
+__version__ = '0.3.1'
+
+import numpy as np
+
+
+class Sampler:
+    """
+    Drop-in replacement of custom_sampler.Sampler drawing whole batches of (user, positive, negative) triples.
+    User profiles are stored as CSR indptr/indices, and negatives colliding with the profile are rejected
+    with a sorted search over the (user, item) keys of the training set.
+    """
+    def __init__(self, indexed_ratings, seed=42):
+        np.random.seed(seed)
+        self._indexed_ratings = indexed_ratings
+        users = np.fromiter(self._indexed_ratings.keys(), dtype=np.int64, count=len(self._indexed_ratings))
+        self._nusers = len(users)
+        self._items = list({k for a in self._indexed_ratings.values() for k in a.keys()})
+        self._nitems = len(self._items)
+
+        lengths = np.fromiter((len(a) for a in self._indexed_ratings.values()), dtype=np.int64, count=self._nusers)
+        rows = np.repeat(users, lengths)
+        cols = np.fromiter((k for a in self._indexed_ratings.values() for k in a.keys()), dtype=np.int64,
+                           count=lengths.sum())
+        # sorted unique (user, item) keys, i.e. the CSR indices of each user row in order
+        self._width = max(self._nitems, cols.max(initial=-1) + 1)
+        self._keys = np.unique(rows * self._width + cols)
+        self._indices = self._keys % self._width
+        self._indptr = np.searchsorted(self._keys, np.arange(users.max(initial=-1) + 2) * self._width)
+        # users whose profile leaves no negative item to sample are skipped
+        profile_lengths = np.diff(self._indptr)[users]
+        self._users = users[(profile_lengths > 0) & (profile_lengths < self._nitems)]
+
+    def is_positive(self, users, items):
+        keys = users * self._width + items
+        position = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        return self._keys[position] == keys
+
+    def sample(self, n, random_state=np.random):
+        r_int = random_state.randint
+        u = self._users[r_int(len(self._users), size=n)]
+        start, stop = self._indptr[u], self._indptr[u + 1]
+        i = self._indices[start + r_int(0, stop - start)]
+
+        j = r_int(self._nitems, size=n)
+        rejected = np.flatnonzero(self.is_positive(u, j))
+        while len(rejected):
+            j[rejected] = r_int(self._nitems, size=len(rejected))
+            rejected = rejected[self.is_positive(u[rejected], j[rejected])]
+        return u, i, j
+
+    def batch(self, n, random_state=np.random):
+        bui, bii, bij = self.sample(n, random_state)
+        return bui[:, None], bii[:, None], bij[:, None]
+
+    def step(self, events: int, batch_size: int):
+        for batch_start in range(0, events, batch_size):
+            yield self.batch(min(batch_start + batch_size, events) - batch_start)
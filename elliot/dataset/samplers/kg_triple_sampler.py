@@ -0,0 +1,78 @@
+"""
+Module description:
+
+"""
+
+__version__ = '0.3.1'
+
+import numpy as np
+
+
+class PairIndex:
+    """
+    CSR index from the (a, b) pairs of the triples to the sorted entities completing them,
+    e.g. from (predicate, object) to the subjects.
+    """
+    def __init__(self, a, b, entities, n_entities):
+        pairs, self.pair_ids = np.unique(np.stack([a, b], axis=1), axis=0, return_inverse=True)
+        self.pair_ids = self.pair_ids.reshape(-1)
+        order = np.lexsort((entities, self.pair_ids))
+        self.indptr = np.searchsorted(self.pair_ids[order], np.arange(len(pairs) + 1))
+        self.indices = entities[order]
+        self._n_entities = n_entities
+        # flattened (pair, entity) keys, sorted as the CSR rows
+        self._keys = np.repeat(np.arange(len(pairs)), np.diff(self.indptr)) * n_entities + self.indices
+
+    def contains(self, pair_ids, entities):
+        keys = pair_ids * self._n_entities + entities
+        position = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        return self._keys[position] == keys
+
+
+class Sampler:
+    """
+    Sampler of positive and corrupted triples for the KG embedding models (CKE, CoFM, KTUP).
+    Each triple has either its head or its tail replaced with a random entity, and corrupted triples
+    found in the KG are drawn again, for the whole batch at once.
+    """
+    def __init__(self, entity_to_idx, Xs, Xp, Xo, events, seed=42):
+        self._random = np.random.RandomState(seed)
+        self.events = events
+        self.Xs, self.Xp, self.Xo = Xs, Xp, Xo
+        self._n_entities = len(entity_to_idx)
+        s, p, o = self._triples = tuple(np.asarray(X, dtype=np.int64) for X in (Xs, Xp, Xo))
+        self.head_index = PairIndex(p, o, s, self._n_entities)
+        self.tail_index = PairIndex(s, p, o, self._n_entities)
+
+    def step(self, batch_size: int):
+        ntriples = len(self.Xs)
+        shuffled_list = self._random.randint(ntriples, size=self.events)
+
+        for start_idx in range(0, self.events, batch_size):
+            batch = shuffled_list[start_idx: min(start_idx + batch_size, self.events)]
+            ph, pr, pt = self.Xs[batch], self.Xp[batch], self.Xo[batch]
+            nh, nr, nt = self.corrupt(batch)
+            yield ph, pr, pt, nh, nr, nt
+
+    def corrupt(self, batch):
+        """
+        :param batch: indices of the positive triples
+        :return: heads, relations and tails of the corrupted triples
+        """
+        nh, nr, nt = (X[batch].astype(np.int32) for X in self._triples)
+        corrupt_head = self._random.random_sample(len(batch)) < 0.5
+        heads, tails = np.flatnonzero(corrupt_head), np.flatnonzero(~corrupt_head)
+        nh[heads] = self.filter(self.head_index, self.head_index.pair_ids[batch[heads]])
+        nt[tails] = self.filter(self.tail_index, self.tail_index.pair_ids[batch[tails]])
+        return nh, nr, nt
+
+    def filter(self, index, pair_ids):
+        """
+        Draw an entity for each pair, until none of them completes a triple of the KG
+        """
+        entities = self._random.randint(self._n_entities, size=len(pair_ids))
+        rejected = np.flatnonzero(index.contains(pair_ids, entities))
+        while len(rejected):
+            entities[rejected] = self._random.randint(self._n_entities, size=len(rejected))
+            rejected = rejected[index.contains(pair_ids[rejected], entities[rejected])]
+        return entities
@@ -0,0 +1,80 @@
+"""
+Module description:
+
+"""
+
+__version__ = '0.3.1'
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+
+class PrefetchSampler:
+    """
+    Wrap a sampler so that the next batches are built in background threads while the model trains on the current one.
+    At most queue_depth batches are built ahead, already converted to (optionally pinned) torch tensors,
+    and they are always yielded in order.
+
+    Samplers exposing batch(size, random_state) draw every batch from its own generator, seeded with
+    (seed, epoch, batch start), so they are built by several workers and the batches do not depend on their number.
+    The other samplers draw from the global NumPy generator and are advanced by a single worker.
+    """
+    def __init__(self, sampler, seed=42, queue_depth=4, workers=1, pin_memory=False):
+        self._sampler = sampler
+        self._seed = seed
+        self._queue_depth = max(1, queue_depth)
+        self._workers = max(1, workers)
+        self._pin_memory = pin_memory and torch.cuda.is_available()
+        self._epoch = 0
+
+    @classmethod
+    def from_meta(cls, sampler, meta, seed):
+        """
+        :param meta: meta section of the model, with the optional settings
+        prefetch (queue depth, 0 disables prefetching), prefetch_workers and pin_memory
+        :return: the prefetching sampler, or the sampler itself if prefetching is disabled
+        """
+        queue_depth = getattr(meta, "prefetch", 0)
+        if not queue_depth:
+            return sampler
+        return cls(sampler, seed, queue_depth, getattr(meta, "prefetch_workers", 1), getattr(meta, "pin_memory", False))
+
+    def to_tensors(self, batch):
+        if isinstance(batch, (tuple, list)):
+            return type(batch)(self.to_tensors(b) for b in batch)
+        if isinstance(batch, np.ndarray):
+            tensor = torch.from_numpy(batch)
+            return tensor.pin_memory() if self._pin_memory else tensor
+        return batch
+
+    def step(self, events: int, batch_size: int):
+        self._epoch += 1
+        epoch = self._epoch
+        if hasattr(self._sampler, 'batch'):
+            def build(start):
+                random_state = np.random.RandomState([self._seed, epoch, start])
+                return self.to_tensors(self._sampler.batch(min(start + batch_size, events) - start, random_state))
+            workers = self._workers
+        else:
+            batches = self._sampler.step(events, batch_size)
+
+            def build(start):
+                return self.to_tensors(next(batches))
+            workers = 1
+
+        pending = deque()
+        with ThreadPoolExecutor(workers) as executor:
+            try:
+                for batch_start in range(0, events, batch_size):
+                    pending.append(executor.submit(build, batch_start))
+                    if len(pending) > self._queue_depth:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                # the training loop may stop early
+                for future in pending:
+                    future.cancel()
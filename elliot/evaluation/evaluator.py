@@ -29,9 +29,11 @@ import numpy as np
 
 import elliot.dataset.dataset as ds
 from elliot.utils import logging
+from elliot.utils.recommendation_block import RecommendationBlock
 from . import metrics
 from . import popularity_utils
 from . import relevance
+from .ranking_engine import RankingEngine
 
 from sklearn.metrics import mean_squared_error
 
@@ -64,7 +66,9 @@ class Evaluator(object):
 
         self._pop = popularity_utils.Popularity(self._data)
 
+        self._ranking_metrics = [m for m in self._metrics if m.name() in RankingEngine.supported_metrics]
         self._evaluation_objects = SimpleNamespace(relevance=relevance.Relevance(self._test, self._rel_threshold),
+                                                   ranking_engine=self._build_ranking_engine(self._test),
                                                    pop=self._pop,
                                                    num_items=self._data.num_items,
                                                    data = self._data,
@@ -72,6 +76,7 @@ class Evaluator(object):
         if data.get_validation():
             self._val = data.get_validation()
             self._val_evaluation_objects = SimpleNamespace(relevance=relevance.Relevance(self._val, self._rel_threshold),
+                                                           ranking_engine=self._build_ranking_engine(self._val),
                                                            pop=self._pop,
                                                            num_items=self._data.num_items,
                                                            data = self._data,
@@ -84,8 +89,9 @@ class Evaluator(object):
         :return:
         """
         result_dict = {}
+        ranking_results = self._eval_ranking_metrics(recommendations)
         for k in self._k:
-            val_results, val_statistical_results, test_results, test_statistical_results = self.eval_at_k(recommendations, k)
+            val_results, val_statistical_results, test_results, test_statistical_results = self.eval_at_k(recommendations, k, ranking_results)
             local_result_dict ={"val_results": val_results,
                                 "val_statistical_results": val_statistical_results,
                                 "test_results": test_results,
@@ -106,13 +112,16 @@ class Evaluator(object):
                            "test_statistical_results": []}}
         return result_dict
 
-    def eval_at_k(self, recommendations, k):
+    def eval_at_k(self, recommendations, k, ranking_results=None):
         val_test = ["Validation", "Test"]
         result_list = []
+        if ranking_results is None:
+            ranking_results = self._eval_ranking_metrics(recommendations, [k])
         for p, (test_data, eval_objs) in enumerate(self._get_test_data()):
             if eval_objs is not None:
                 eval_objs.cutoff = k
-            results, statistical_results = self._process_test_data(recommendations[p], test_data, eval_objs, val_test[p])
+            results, statistical_results = self._process_test_data(recommendations[p], test_data, eval_objs, val_test[p],
+                                                                   ranking_results[p])
             result_list.append((results, statistical_results))
 
         if (not result_list[0][0]):
@@ -129,19 +138,77 @@ class Evaluator(object):
                  self._evaluation_objects if hasattr(self, '_evaluation_objects') else None)
                 ]
 
-    def _process_test_data(self, recommendations, test_data, eval_objs, val_test):
+    def _build_ranking_engine(self, test):
+        if not self._ranking_metrics:
+            return None
+        return RankingEngine(test, self._rel_threshold, self._data.public_users, self._data.public_items)
+
+    def _eval_ranking_metrics(self, recommendations, cutoffs=None):
+        """
+        Compute the metrics supported by the ranking engine for all the cutoffs in one pass
+        :return: for validation and test, None or {cutoff: {metric name: {user: value}}}
+        """
+        cutoffs = cutoffs or self._k
+        ranking_results = []
+        for p, (test_data, eval_objs) in enumerate(self._get_test_data()):
+            if (not test_data) or (not eval_objs) or (eval_objs.ranking_engine is None):
+                ranking_results.append(None)
+                continue
+            if isinstance(recommendations[p], RecommendationBlock):
+                # users without relevant items are discarded by the engine
+                users, items = recommendations[p].users, recommendations[p].item_indices
+            else:
+                users, items = self._to_arrays({u: recs for u, recs in recommendations[p].items()
+                                                if test_data.get(u, [])})
+            users, results = eval_objs.ranking_engine.eval(users, items, cutoffs,
+                                                           [m.name() for m in self._ranking_metrics])
+            users = [self._data.private_users[u] for u in users.tolist()]
+            ranking_results.append({k: {name: dict(zip(users, values.tolist())) for name, values in at_k.items()}
+                                    for k, at_k in results.items()})
+        return ranking_results
+
+    def _to_arrays(self, recommendations):
+        """
+        Convert {user: [(item, score), ...]} recommendations to private user ids and a users x k item ids matrix
+        """
+        public_users, public_items = self._data.public_users, self._data.public_items
+        length = max((len(recs) for recs in recommendations.values()), default=0)
+        users = np.fromiter((public_users[u] for u in recommendations.keys()), dtype=np.int64,
+                            count=len(recommendations))
+        items = np.full((len(recommendations), length), -1, dtype=np.int64)
+        for row, recs in enumerate(recommendations.values()):
+            items[row, :len(recs)] = [public_items[i] for i, _ in recs]
+        return users, items
+
+    @staticmethod
+    def _filter_users(recommendations, test_data):
+        """
+        Keep the recommendations of the users in the test data, blocks are filtered without building the lists
+        """
+        if isinstance(recommendations, RecommendationBlock):
+            return recommendations.select(np.array([bool(test_data.get(u, [])) for u in recommendations.public_users()],
+                                                   dtype=bool))
+        return {u: recs for u, recs in recommendations.items() if test_data.get(u, [])}
+
+    def _process_test_data(self, recommendations, test_data, eval_objs, val_test, ranking_results=None):
         if (not test_data) or (not eval_objs):
             return None, None
         else:
-            recommendations = {u: recs for u, recs in recommendations.items() if test_data.get(u, [])}
+            recommendations = self._filter_users(recommendations, test_data)
             rounding_factor = 5
             eval_start_time = time()
 
-            metric_objects = [m(recommendations, self._data.config, self._params, eval_objs) for m in self._metrics]
+            ranking_results = ranking_results[eval_objs.cutoff] if ranking_results else {}
+            metric_objects = [m(recommendations, self._data.config, self._params, eval_objs) for m in self._metrics
+                              if m.name() not in ranking_results]
             for metric in self._complex_metrics:
                 metric_objects.extend(metrics.parse_metric(metric["metric"])(recommendations, self._data.config,
                                                                              self._params, eval_objs, metric).get())
-            results = {m.name(): m.eval() for m in metric_objects}
+            results = {m.name(): np.average(list(ranking_results[m.name()].values())) for m in self._metrics
+                       if m.name() in ranking_results}
+            results.update({m.name(): m.eval() for m in metric_objects})
+            # keep the order of the configuration
+            results = {**{m.name(): results[m.name()] for m in self._metrics if m.name() in results}, **results}
 
             str_results = {k: str(round(v, rounding_factor)) for k, v in results.items()}
             # res_print = "\t".join([":".join(e) for e in str_results.items()])
@@ -157,8 +224,11 @@ class Evaluator(object):
                 statistical_results = {metric_object.name(): metric_object.eval_user_metric()
                                        for metric_object in
                                        [m(recommendations, self._data.config, self._params, eval_objs) for m
-                                        in self._metrics]
+                                        in self._metrics if m.name() not in ranking_results]
                                        if isinstance(metric_object, metrics.StatisticalMetric)}
+                statistical_results.update(ranking_results)
+                statistical_results = {m.name(): statistical_results[m.name()] for m in self._metrics
+                                       if m.name() in statistical_results}
             return results, statistical_results
 
     def _compute_needed_recommendations(self):
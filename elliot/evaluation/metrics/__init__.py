@@ -12,93 +12,66 @@ __version__ = '0.3.1'
 __author__ = 'Vito Walter Anelli, Claudio Pomo'
 __email__ = 'vitowalter.anelli@poliba.it, claudio.pomo@poliba.it'
 
-from elliot.evaluation.metrics.accuracy.ndcg import nDCG, nDCGRendle2020
-from elliot.evaluation.metrics.accuracy.precision import Precision
-from elliot.evaluation.metrics.accuracy.recall import Recall
-from elliot.evaluation.metrics.accuracy.hit_rate import HR
-from elliot.evaluation.metrics.accuracy.mrr import MRR
-from elliot.evaluation.metrics.accuracy.map import MAP
-from elliot.evaluation.metrics.accuracy.mar import MAR
-from elliot.evaluation.metrics.accuracy.f1 import F1, ExtendedF1
-from elliot.evaluation.metrics.accuracy.DSC import DSC
-from elliot.evaluation.metrics.accuracy.AUC import LAUC, AUC, GAUC
-
-from elliot.evaluation.metrics.rating.mae import MAE
-from elliot.evaluation.metrics.rating.mse import MSE
-from elliot.evaluation.metrics.rating.rmse import RMSE
-
-from elliot.evaluation.metrics.coverage import ItemCoverage, UserCoverage, NumRetrieved, UserCoverageAtN
-
-from elliot.evaluation.metrics.diversity.gini_index import GiniIndex
-from elliot.evaluation.metrics.diversity.shannon_entropy import ShannonEntropy
-from elliot.evaluation.metrics.diversity.SRecall import SRecall
-
-from elliot.evaluation.metrics.novelty.EFD import EFD, ExtendedEFD
-from elliot.evaluation.metrics.novelty.EPC import EPC, ExtendedEPC
-
-from elliot.evaluation.metrics.bias import ARP, APLT, ACLT, PopRSP, PopREO, ExtendedPopRSP, ExtendedPopREO
-
-from elliot.evaluation.metrics.fairness.MAD import UserMADrating, ItemMADrating, UserMADranking, ItemMADranking
-from elliot.evaluation.metrics.fairness.BiasDisparity import BiasDisparityBR, BiasDisparityBS, BiasDisparityBD
-from elliot.evaluation.metrics.fairness.rsp import RSP
-from elliot.evaluation.metrics.fairness.reo import REO
-
 from elliot.evaluation.metrics.statistical_array_metric import StatisticalMetric
+from elliot.utils.lazy_import import import_attribute, lazy_getattr
 
+# metrics are imported when the configuration asks for them
 _metric_dictionary = {
-    "nDCG": nDCG,
-    "nDCGRendle2020": nDCGRendle2020,
-    "Precision": Precision,
-    "Recall": Recall,
-    "HR": HR,
-    "MRR": MRR,
-    "MAP": MAP,
-    "MAR": MAR,
-    "F1": F1,
-    "ExtendedF1": ExtendedF1,
-    "DSC": DSC,
-    "LAUC": LAUC,
-    "GAUC": GAUC,
-    "AUC": AUC,
-    "ItemCoverage": ItemCoverage,
-    "UserCoverage": UserCoverage,
-    "UserCoverageAtN": UserCoverageAtN,
-    "NumRetrieved": NumRetrieved,
-    "Gini": GiniIndex,
-    "SEntropy": ShannonEntropy,
-    "EFD": EFD,
-    "ExtendedEFD": ExtendedEFD,
-    "EPC": EPC,
-    "ExtendedEPC": ExtendedEPC,
-    "MAE": MAE,
-    "MSE": MSE,
-    "RMSE": RMSE,
-    "UserMADrating": UserMADrating,
-    "ItemMADrating": ItemMADrating,
-    "UserMADranking": UserMADranking,
-    "ItemMADranking": ItemMADranking,
-    "BiasDisparityBR": BiasDisparityBR,
-    "BiasDisparityBS": BiasDisparityBS,
-    "BiasDisparityBD": BiasDisparityBD,
-    "SRecall": SRecall,
-    "ARP": ARP,
-    "APLT": APLT,
-    "ACLT": ACLT,
-    "PopRSP": PopRSP,
-    "PopREO": PopREO,
-    "ExtendedPopRSP": ExtendedPopRSP,
-    "ExtendedPopREO": ExtendedPopREO,
-    "RSP": RSP,
-    "REO": REO
+    "nDCG": "elliot.evaluation.metrics.accuracy.ndcg.nDCG",
+    "nDCGRendle2020": "elliot.evaluation.metrics.accuracy.ndcg.nDCGRendle2020",
+    "Precision": "elliot.evaluation.metrics.accuracy.precision.Precision",
+    "Recall": "elliot.evaluation.metrics.accuracy.recall.Recall",
+    "HR": "elliot.evaluation.metrics.accuracy.hit_rate.HR",
+    "MRR": "elliot.evaluation.metrics.accuracy.mrr.MRR",
+    "MAP": "elliot.evaluation.metrics.accuracy.map.MAP",
+    "MAR": "elliot.evaluation.metrics.accuracy.mar.MAR",
+    "F1": "elliot.evaluation.metrics.accuracy.f1.F1",
+    "ExtendedF1": "elliot.evaluation.metrics.accuracy.f1.ExtendedF1",
+    "DSC": "elliot.evaluation.metrics.accuracy.DSC.DSC",
+    "LAUC": "elliot.evaluation.metrics.accuracy.AUC.LAUC",
+    "GAUC": "elliot.evaluation.metrics.accuracy.AUC.GAUC",
+    "AUC": "elliot.evaluation.metrics.accuracy.AUC.AUC",
+    "ItemCoverage": "elliot.evaluation.metrics.coverage.ItemCoverage",
+    "UserCoverage": "elliot.evaluation.metrics.coverage.UserCoverage",
+    "UserCoverageAtN": "elliot.evaluation.metrics.coverage.UserCoverageAtN",
+    "NumRetrieved": "elliot.evaluation.metrics.coverage.NumRetrieved",
+    "Gini": "elliot.evaluation.metrics.diversity.gini_index.GiniIndex",
+    "SEntropy": "elliot.evaluation.metrics.diversity.shannon_entropy.ShannonEntropy",
+    "EFD": "elliot.evaluation.metrics.novelty.EFD.EFD",
+    "ExtendedEFD": "elliot.evaluation.metrics.novelty.EFD.ExtendedEFD",
+    "EPC": "elliot.evaluation.metrics.novelty.EPC.EPC",
+    "ExtendedEPC": "elliot.evaluation.metrics.novelty.EPC.ExtendedEPC",
+    "MAE": "elliot.evaluation.metrics.rating.mae.MAE",
+    "MSE": "elliot.evaluation.metrics.rating.mse.MSE",
+    "RMSE": "elliot.evaluation.metrics.rating.rmse.RMSE",
+    "UserMADrating": "elliot.evaluation.metrics.fairness.MAD.UserMADrating",
+    "ItemMADrating": "elliot.evaluation.metrics.fairness.MAD.ItemMADrating",
+    "UserMADranking": "elliot.evaluation.metrics.fairness.MAD.UserMADranking",
+    "ItemMADranking": "elliot.evaluation.metrics.fairness.MAD.ItemMADranking",
+    "BiasDisparityBR": "elliot.evaluation.metrics.fairness.BiasDisparity.BiasDisparityBR",
+    "BiasDisparityBS": "elliot.evaluation.metrics.fairness.BiasDisparity.BiasDisparityBS",
+    "BiasDisparityBD": "elliot.evaluation.metrics.fairness.BiasDisparity.BiasDisparityBD",
+    "SRecall": "elliot.evaluation.metrics.diversity.SRecall.SRecall",
+    "ARP": "elliot.evaluation.metrics.bias.ARP",
+    "APLT": "elliot.evaluation.metrics.bias.APLT",
+    "ACLT": "elliot.evaluation.metrics.bias.ACLT",
+    "PopRSP": "elliot.evaluation.metrics.bias.PopRSP",
+    "PopREO": "elliot.evaluation.metrics.bias.PopREO",
+    "ExtendedPopRSP": "elliot.evaluation.metrics.bias.ExtendedPopRSP",
+    "ExtendedPopREO": "elliot.evaluation.metrics.bias.ExtendedPopREO",
+    "RSP": "elliot.evaluation.metrics.fairness.rsp.RSP",
+    "REO": "elliot.evaluation.metrics.fairness.reo.REO"
 }
 
 _lower_dict = {k.lower(): v for k, v in _metric_dictionary.items()}
 
+__getattr__ = lazy_getattr(__name__, {path.rsplit(".", 1)[1]: path for path in _metric_dictionary.values()})
+
 
 def parse_metrics(metrics):
-    return [_lower_dict[m.lower()] for m in metrics if m.lower() in _lower_dict.keys()]
+    return [import_attribute(_lower_dict[m.lower()]) for m in metrics if m.lower() in _lower_dict.keys()]
 
 
 def parse_metric(metric):
     metric = metric.lower()
-    return _lower_dict[metric] if metric in _lower_dict.keys() else None
+    return import_attribute(_lower_dict[metric]) if metric in _lower_dict.keys() else None
@@ -0,0 +1,114 @@
+"""
+Module description:
+
+"""
+
+__version__ = '0.3.1'
+
+import numpy as np
+
+
+class RankingEngine(object):
+    """
+    Vectorized computation of the accuracy metrics of the top-k lists of all users, for all the cutoffs at once.
+    Relevance judgements are stored as sorted (user, item) keys over the private ids,
+    so the top-k matrix is matched against them with a single searchsorted.
+    """
+
+    supported_metrics = ("nDCG", "nDCGRendle2020", "Precision", "Recall")
+
+    def __init__(self, test, rel_threshold, public_users, public_items):
+        """
+        :param test: test (or validation) set in the form {user: {item: rating}} with public ids
+        :param rel_threshold: relevance threshold
+        :param public_users: public to private user ids
+        :param public_items: public to private item ids
+        """
+        self._num_items = len(public_items)
+        self._n_relevant = np.zeros(len(public_users), dtype=np.int64)
+        keys, gains, user_gains = [], [], []
+        for u, test_items in test.items():
+            if u not in public_users:
+                continue
+            p_u = public_users[u]
+            relevant = {i: 2 ** (r - rel_threshold + 1) - 1 for i, r in test_items.items() if r >= rel_threshold}
+            # relevant items out of the catalogue count for recall and ideal DCG, even if they cannot be recommended
+            self._n_relevant[p_u] = len(relevant)
+            user_gains.append((p_u, sorted(relevant.values(), reverse=True)))
+            for i, g in relevant.items():
+                if i in public_items:
+                    keys.append(p_u * self._num_items + public_items[i])
+                    gains.append(g)
+        order = np.argsort(keys, kind='stable')
+        self._keys = np.asarray(keys, dtype=np.int64)[order]
+        self._gains = np.asarray(gains, dtype=np.float64)[order]
+        self._user_gains = user_gains
+        self._ideal_gains = None
+
+    @staticmethod
+    def discount(length):
+        return np.log(2) / np.log(np.arange(length) + 2)
+
+    def ideal_gains(self, length):
+        """
+        :return: users x length matrix of the relevance gains sorted in decreasing order, zero padded
+        """
+        if self._ideal_gains is None or self._ideal_gains.shape[1] < length:
+            self._ideal_gains = np.zeros((len(self._n_relevant), length))
+            for u, g in self._user_gains:
+                g = g[:length]
+                self._ideal_gains[u, :len(g)] = g
+        return self._ideal_gains[:, :length]
+
+    def relevance(self, users, items):
+        """
+        :param users: private user ids (n)
+        :param items: n x k matrix of private item ids, negative ids are padding
+        :return: (binary hits, gains) n x k matrices
+        """
+        keys = users[:, None].astype(np.int64) * self._num_items + items
+        if not len(self._keys):
+            return np.zeros(items.shape, dtype=bool), np.zeros(items.shape)
+        position = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        hits = (self._keys[position] == keys) & (items >= 0)
+        return hits, np.where(hits, self._gains[position], 0.)
+
+    def eval(self, users, items, cutoffs, metrics=supported_metrics):
+        """
+        :param users: private user ids (n)
+        :param items: n x k matrix of the top-k private item ids
+        :param cutoffs: list of cutoffs, not larger than k
+        :param metrics: names of the metrics to compute
+        :return: (users with at least a relevant item, {cutoff: {metric name: per-user values}})
+        """
+        users = np.asarray(users, dtype=np.int64)
+        n_relevant = self._n_relevant[users]
+        evaluated = n_relevant > 0
+        users, items, n_relevant = users[evaluated], np.asarray(items)[evaluated], n_relevant[evaluated]
+
+        max_cutoff = max(cutoffs)
+        items = items[:, :max_cutoff]
+        hits, gains = self.relevance(users, items)
+        discount = self.discount(max_cutoff)
+        # cumulated values at each position of the list
+        cum_hits = np.cumsum(hits, axis=1)
+        cum_dcg = np.cumsum(gains * discount[:items.shape[1]], axis=1)
+        cum_binary_dcg = np.cumsum(hits * discount[:items.shape[1]], axis=1)
+        cum_idcg = np.cumsum(self.ideal_gains(max_cutoff)[users] * discount, axis=1)
+        cum_discount = np.cumsum(discount)
+
+        results = {}
+        for k in cutoffs:
+            last = min(k, items.shape[1]) - 1
+            at_k = {}
+            if "Precision" in metrics:
+                at_k["Precision"] = cum_hits[:, last] / k
+            if "Recall" in metrics:
+                at_k["Recall"] = cum_hits[:, last] / n_relevant
+            if "nDCG" in metrics:
+                dcg, idcg = cum_dcg[:, last], cum_idcg[:, k - 1]
+                at_k["nDCG"] = np.divide(dcg, idcg, out=np.zeros_like(dcg), where=dcg > 0)
+            if "nDCGRendle2020" in metrics:
+                at_k["nDCGRendle2020"] = cum_binary_dcg[:, last] / cum_discount[np.minimum(n_relevant, k) - 1]
+            results[k] = at_k
+        return users, results
@@ -8,6 +8,8 @@ __author__ = 'Vito Walter Anelli, Claudio Pomo'
 __email__ = 'vitowalter.anelli@poliba.it, claudio.pomo@poliba.it'
 
 from elliot.hyperoptimization.model_coordinator import ModelCoordinator
+from elliot.hyperoptimization.parallel_trials import parallel_fmin
+from elliot.hyperoptimization.successive_halving import SuccessiveHalving
 from hyperopt import tpe, atpe, mix, rand, anneal
 import numpy as np
 
@@ -12,8 +12,10 @@ import typing as t
 import numpy as np
 import logging as pylog
 import time
+from functools import partial
 
 from elliot.utils import logging
+from elliot.hyperoptimization.successive_halving import SuccessiveHalving
 
 from hyperopt import STATUS_OK
 
@@ -38,6 +40,9 @@ class ModelCoordinator(object):
         self.model_class = model_class
         self.test_fold_index = test_fold_index
         self.model_config_index = 0
+        # successive halving of the explored configurations, as set in the meta section next to the search space
+        pruning = getattr(params[0].meta, "hyper_pruning", None) if isinstance(params, tuple) else None
+        self.pruning = SuccessiveHalving(**pruning) if pruning else None
 
     def objective(self, args):
         """
@@ -62,6 +67,8 @@ class ModelCoordinator(object):
             self.logger.info(f"Exploration: Test Fold exploration number {self.test_fold_index+1}")
             self.logger.info(f"Exploration: Train-Validation Fold exploration number {trainval_index+1}")
             model = self.model_class(data=data_obj, config=self.base, params=model_params)
+            if self.pruning is not None:
+                model.set_pruning(partial(self.pruning.prune, trainval_index))
             tic = time.perf_counter()
             model.train()
             toc = time.perf_counter()
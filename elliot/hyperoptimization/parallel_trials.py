@@ -0,0 +1,103 @@
+"""
+Module description:
+
+"""
+
+__version__ = '0.3.1'
+
+import multiprocessing as mp
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+from hyperopt import base
+from hyperopt.utils import coarse_utcnow
+
+# worker state, set once per process by init_worker
+_coordinator = None
+_domain = None
+
+
+def init_worker(coordinator, space, threads):
+    """
+    :param coordinator: ModelCoordinator of the model under tuning
+    :param space: hyperopt search space
+    :param threads: maximum number of threads of the numerical libraries in each worker
+    """
+    global _coordinator, _domain
+    _coordinator = coordinator
+    _domain = base.Domain(coordinator.objective, space)
+    if threads:
+        # read by the libraries initialized in the worker (e.g. TensorFlow)
+        for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+            os.environ[var] = str(threads)
+        # and applied to the ones already loaded
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+        if "torch" in sys.modules:
+            sys.modules["torch"].set_num_threads(threads)
+
+
+def evaluate(tid, spec):
+    _coordinator.model_config_index = tid
+    return _domain.evaluate(spec, None)
+
+
+def parallel_fmin(coordinator, space, algo, max_evals, trials, rstate, workers, threads=None):
+    """
+    Run ModelCoordinator.objective on several hyperparameter configurations at once, with a pool of processes.
+
+    The configurations are suggested by algo in batches of `workers`, each with a seed drawn from rstate,
+    as fmin does when max_queue_len is the number of workers, so the explored configurations only depend on
+    rstate and on the number of workers. The evaluated trials are stored in `trials` as with fmin.
+    :param coordinator: ModelCoordinator of the model under tuning
+    :param space: hyperopt search space
+    :param algo: hyperopt suggest function
+    :param max_evals: number of configurations to evaluate
+    :param trials: hyperopt Trials
+    :param rstate: numpy random generator (or RandomState)
+    :param workers: number of configurations evaluated at once
+    :param threads: threads of the numerical libraries in each worker, by default the cores are split among them
+    :return: trials
+    """
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    domain = base.Domain(coordinator.objective, space)
+    draw_seed = rstate.integers if hasattr(rstate, "integers") else rstate.randint
+    # forked workers share the data of the coordinator instead of receiving a copy
+    context = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else None)
+    torch = sys.modules.get("torch")
+    if context.get_start_method() == "fork" and torch is not None and torch.cuda.is_initialized():
+        raise Exception("hyper_workers > 1 cannot run once CUDA is initialized in the main process "
+                        "(e.g. by a previous model of the experiment): CUDA cannot be re-initialized in "
+                        "the forked workers. Run the parallel exploration in a separate experiment, "
+                        "or set hyper_workers to 1.")
+    pruning = getattr(coordinator, "pruning", None)
+    with ExitStack() as stack:
+        if pruning is not None:
+            # the trials running in the workers compete at the same rungs
+            pruning.share(stack.enter_context(context.Manager()))
+            stack.callback(pruning.share)
+        executor = stack.enter_context(ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker,
+                                                           initargs=(coordinator, space, threads)))
+        while len(trials) < max_evals:
+            new_ids = trials.new_trial_ids(min(workers, max_evals - len(trials)))
+            trials.refresh()
+            new_trials = algo(new_ids, domain, trials, draw_seed(2 ** 31 - 1))
+            if not new_trials:
+                break
+            trials.insert_trial_docs(new_trials)
+            trials.refresh()
+
+            pending = [trial for trial in trials._dynamic_trials if trial["state"] == base.JOB_STATE_NEW]
+            futures = []
+            for trial in pending:
+                trial["state"] = base.JOB_STATE_RUNNING
+                trial["book_time"] = trial["refresh_time"] = coarse_utcnow()
+                futures.append(executor.submit(evaluate, trial["tid"], base.spec_from_misc(trial["misc"])))
+            for trial, future in zip(pending, futures):
+                trial["result"] = future.result()
+                trial["state"] = base.JOB_STATE_DONE
+                trial["refresh_time"] = coarse_utcnow()
+            trials.refresh()
+    return trials
@@ -0,0 +1,72 @@
+"""
+Module description:
+
+"""
+
+__version__ = '0.3.1'
+
+import threading
+
+
+class SuccessiveHalving:
+    """
+    Asynchronous successive halving (ASHA) of the hyperparameter exploration.
+
+    The trials are compared at shared epoch checkpoints (the rungs min_epochs * reduction_factor^r), on the loss
+    they would report to hyperopt at that epoch. A trial reaching a rung goes on only if it is in the best
+    1 / reduction_factor of the trials that already reached the rung, otherwise its training stops there.
+    It is configured in the meta section of a model, next to the search space:
+
+        hyper_pruning:
+          min_epochs: 5
+          reduction_factor: 3
+    """
+
+    def __init__(self, min_epochs=1, reduction_factor=3):
+        """
+        :param min_epochs: epoch of the first rung
+        :param reduction_factor: inverse of the fraction of trials going on at each rung
+        """
+        if min_epochs < 1 or reduction_factor < 2:
+            raise Exception("hyper_pruning requires min_epochs >= 1 and reduction_factor >= 2")
+        self.min_epochs = int(min_epochs)
+        self.reduction_factor = int(reduction_factor)
+        # (train-validation fold, rung epoch) -> losses of the trials that reached it
+        self._rungs = {}
+        self._lock = threading.Lock()
+
+    def share(self, manager=None):
+        """
+        Keep the rungs in a multiprocessing manager, so that trials running in different processes compete,
+        or in the current process again if manager is None
+        """
+        if manager is None:
+            self._rungs, self._lock = dict(self._rungs), threading.Lock()
+        else:
+            self._rungs, self._lock = manager.dict(self._rungs), manager.Lock()
+
+    def is_rung(self, epoch):
+        rung = self.min_epochs
+        while rung < epoch:
+            rung *= self.reduction_factor
+        return rung == epoch
+
+    def prune(self, fold, epoch, loss):
+        """
+        :param fold: train-validation fold of the trial
+        :param epoch: completed epochs of the trial
+        :param loss: loss of the trial after epoch epochs, lower is better
+        :return: True if the trial should stop
+        """
+        if not self.is_rung(epoch):
+            return False
+        key = (fold, epoch)
+        with self._lock:
+            losses = self._rungs.get(key, ()) + (loss,)
+            self._rungs[key] = losses
+        # loss of the last trial going on at the rung
+        threshold = sorted(losses)[max(len(losses) // self.reduction_factor, 1) - 1]
+        return loss > threshold
+
+    def __repr__(self):
+        return f"SuccessiveHalving(min_epochs={self.min_epochs}, reduction_factor={self.reduction_factor})"
@@ -7,11 +7,24 @@ __version__ = '0.3.1'
 __author__ = 'Vito Walter Anelli, Claudio Pomo'
 __email__ = 'vitowalter.anelli@poliba.it, claudio.pomo@poliba.it'
 
+from elliot.utils.lazy_import import lazy_getattr
 from .base_recommender_model import BaseRecommenderModel
 
-from .unpersonalized import Random, MostPop
-from .knowledge_aware import KaHFM, KaHFMBatch, KaHFMEmbeddings, KGIN
-from .knn import ItemKNN, UserKNN, AttributeItemKNN, AttributeUserKNN
-from .generic import ProxyRecommender
-from .autoencoders import EASER
+# models are imported when the configuration asks for them, so that e.g. TensorFlow is loaded by its models only
+_models = {
+    "Random": ".unpersonalized.random_recommender.Random",
+    "MostPop": ".unpersonalized.most_popular.MostPop",
+    "KaHFM": ".knowledge_aware.kaHFM.KaHFM",
+    "KaHFMBatch": ".knowledge_aware.kaHFM_batch.KaHFMBatch",
+    "KaHFMEmbeddings": ".knowledge_aware.kahfm_embeddings.KaHFMEmbeddings",
+    "KGIN": ".knowledge_aware.kgin.KGIN",
+    "ItemKNN": ".knn.item_knn.ItemKNN",
+    "UserKNN": ".knn.user_knn.UserKNN",
+    "AttributeItemKNN": ".knn.attribute_item_knn.AttributeItemKNN",
+    "AttributeUserKNN": ".knn.attribute_user_knn.AttributeUserKNN",
+    "ProxyRecommender": ".generic.Proxy.ProxyRecommender",
+    "EASER": ".autoencoders.EASE_R.EASER",
+}
+
+__getattr__ = lazy_getattr(__name__, _models)
 
@@ -7,5 +7,9 @@ __version__ = '0.3.1'
 __author__ = 'Vito Walter Anelli, Claudio Pomo'
 __email__ = 'vitowalter.anelli@poliba.it, claudio.pomo@poliba.it'
 
-from .vae.multi_vae import MultiVAE
-from .EASE_R import EASER
\ No newline at end of file
+from elliot.utils.lazy_import import lazy_getattr
+
+__getattr__ = lazy_getattr(__name__, {
+    "MultiVAE": ".vae.multi_vae.MultiVAE",
+    "EASER": ".EASE_R.EASER",
+})
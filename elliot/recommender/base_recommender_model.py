@@ -79,6 +79,14 @@ class BaseRecommenderModel(ABC):
         self._losses = []
         self._results = []
         self._params_list = []
+        self._pruning = None
+
+    def set_pruning(self, pruning):
+        """
+        :param pruning: function of the completed epochs and of the current loss, returning True
+        when the hyperparameter exploration stops the training of this configuration
+        """
+        self._pruning = pruning
 
     def get_base_params_shortcut(self):
         return "_".join([str(k) + "=" + str(v).replace(".", "$") for k, v in
@@ -10,8 +10,11 @@ __email__ = 'vitowalter.anelli@poliba.it, claudio.pomo@poliba.it'
 import pickle
 import time
 
+import numpy as np
+
 from elliot.recommender.recommender_utils_mixin import RecMixin
 from elliot.utils.write import store_recommendation
+from elliot.utils.recommendation_block import RecommendationBlock
 
 from elliot.recommender.base_recommender_model import BaseRecommenderModel
 from elliot.recommender.knn.item_knn.item_knn_similarity import Similarity
@@ -59,6 +62,9 @@ class ItemKNN(RecMixin, BaseRecommenderModel):
         ]
         self.autoset_params()
 
+        self._block_size = getattr(self._params, "block_size", 1000)
+        self._batch_eval = getattr(self._params, "batch_eval", 512)
+
         self._ratings = self._data.train_dict
         if self._implementation == "aiolli":
             self._model = AiolliSimilarity(data=self._data,
@@ -74,21 +80,27 @@ class ItemKNN(RecMixin, BaseRecommenderModel):
         else:
             if (not self._normalize) or (self._asymmetric_alpha) or (self._tversky_alpha) or (self._tversky_beta) or (self._row_weights) or (self._shrink):
                 self.logger.info("Options normalize, asymmetric_alpha, tversky_alpha, tversky_beta, row_weights are ignored with standard implementation. Try with implementation: aiolli")
-            self._model = Similarity(data=self._data, num_neighbors=self._num_neighbors, similarity=self._similarity, implicit=self._implicit)
+            self._model = Similarity(data=self._data, num_neighbors=self._num_neighbors, similarity=self._similarity, implicit=self._implicit, block_size=self._block_size)
 
-    def get_single_recommendation(self, mask, k, *args):
-        return {u: self._model.get_user_recs(u, mask, k) for u in self._ratings.keys()}
+    def get_single_recommendation(self, mask, k, predictions, offset, offset_stop):
+        v, i = self._model.get_top_k(predictions, mask[offset: offset_stop], k=k)
+        return RecommendationBlock(np.arange(offset, offset_stop), i, v,
+                                   self._data.private_users, self._data.private_items)
 
     def get_recommendations(self, k: int = 10):
-        predictions_top_k_val = {}
-        predictions_top_k_test = {}
-
-        recs_val, recs_test = self.process_protocol(k)
-
-        predictions_top_k_val.update(recs_val)
-        predictions_top_k_test.update(recs_test)
-
-        return predictions_top_k_val, predictions_top_k_test
+        predictions_top_k_val = []
+        predictions_top_k_test = []
+
+        # the scores are computed for a batch of users at a time
+        for offset in range(0, self._num_users, self._batch_eval):
+            offset_stop = min(offset + self._batch_eval, self._num_users)
+            predictions = self._model.predict(offset, offset_stop)
+            recs_val, recs_test = self.process_protocol(k, predictions, offset, offset_stop)
+            predictions_top_k_val.append(recs_val)
+            predictions_top_k_test.append(recs_test)
+
+        return RecommendationBlock.concatenate(predictions_top_k_val), \
+               RecommendationBlock.concatenate(predictions_top_k_test)
 
     @property
     def name(self):
@@ -12,12 +12,13 @@ class Similarity(object):
     Simple kNN class
     """
 
-    def __init__(self, data, num_neighbors, similarity, implicit):
+    def __init__(self, data, num_neighbors, similarity, implicit, block_size=1000):
         self._data = data
         self._ratings = data.train_dict
         self._num_neighbors = num_neighbors
         self._similarity = similarity
         self._implicit = implicit
+        self._block_size = block_size
 
         if self._implicit:
             self._URM = self._data.sp_i_train
@@ -48,38 +49,23 @@ class Similarity(object):
 
         # self._transactions = self._data.transactions
 
-        self._similarity_matrix = np.empty((len(self._items), len(self._items)))
+        # the similarities are computed for a block of items at a time, and only the top neighbors
+        # of each item are kept, so that the items x items matrix is never allocated
+        X = self._URM.T.tocsr()
+        n_items = X.shape[0]
+        data, rows_indices, cols_counts = [], [], []
 
-        self.process_similarity(self._similarity)
+        for start in range(0, n_items, self._block_size):
+            stop = min(start + self._block_size, n_items)
+            block = self.process_similarity(self._similarity, X, X[start:stop])
+            block_data, block_rows, block_counts = self.top_neighbors(block, self._num_neighbors)
+            data.append(block_data)
+            rows_indices.append(block_rows)
+            cols_counts.append(block_counts)
 
-        # self._similarity_matrix = normalize(self._similarity_matrix, norm='l1', axis=1)
-
-        ##############
-        data, rows_indices, cols_indptr = [], [], []
-
-        column_row_index = np.arange(len(self._data.items), dtype=np.int32)
-
-        for item_idx in range(len(self._data.items)):
-            cols_indptr.append(len(data))
-            column_data = self._similarity_matrix[:, item_idx]
-
-            non_zero_data = column_data != 0
-
-            idx_sorted = np.argsort(column_data[non_zero_data])  # sort by column
-            top_k_idx = idx_sorted[-self._num_neighbors:]
-
-            data.extend(column_data[non_zero_data][top_k_idx])
-            rows_indices.extend(column_row_index[non_zero_data][top_k_idx])
-
-        cols_indptr.append(len(data))
-
-        W_sparse = sparse.csc_matrix((data, rows_indices, cols_indptr),
-                                     shape=(len(self._data.items), len(self._data.items)), dtype=np.float32).tocsr()
-        self._preds = self._URM.dot(W_sparse).toarray()
-        ##############
-        # self.compute_neighbors()
-
-        del self._similarity_matrix
+        cols_indptr = np.concatenate([[0], np.cumsum(np.concatenate(cols_counts))])
+        self._W = sparse.csc_matrix((np.concatenate(data), np.concatenate(rows_indices), cols_indptr),
+                                    shape=(n_items, n_items), dtype=np.float32).tocsr()
 
     # def compute_neighbors(self):
     #     self._neighbors = {}
@@ -92,26 +78,39 @@ class Similarity(object):
     # def get_item_neighbors(self, item):
     #     return self._neighbors.get(item, {})
 
-    def process_similarity(self, similarity):
+    @staticmethod
+    def top_neighbors(block, k):
+        """
+        Keep the k highest non-zero similarities of each column of a block
+        :return: values and row indices of the kept entries, column by column, and their number per column
+        """
+        block = np.where(block != 0, block, -np.inf)
+        k = min(k, block.shape[0])
+        rows = np.argpartition(-block, k - 1, axis=0)[:k].T
+        values = np.take_along_axis(block.T, rows, axis=1)
+        kept = np.isfinite(values)
+        return values[kept], rows[kept], kept.sum(axis=1)
+
+    def process_similarity(self, similarity, X, Y):
+        """
+        :return: X rows x Y rows similarity matrix
+        """
         if similarity == "cosine":
-            # x, y = np.triu_indices(self._similarity_matrix.shape[0], k=1)
-            # self._similarity_matrix[x, y] = cosine_similarity(self._data.sp_i_train_ratings.T)[x, y]
-            self._similarity_matrix = cosine_similarity(self._URM.T)
+            return cosine_similarity(X, Y)
         elif similarity == "dot":
-            self._similarity_matrix = (self._URM.T @ self._URM).toarray()
+            return (X @ Y.T).toarray()
         elif similarity == "euclidean":
-            self._similarity_matrix = (1 / (1 + euclidean_distances(self._URM.T)))
+            return 1 / (1 + euclidean_distances(X, Y))
         elif similarity == "manhattan":
-            self._similarity_matrix = (1 / (1 + manhattan_distances(self._URM.T)))
+            return 1 / (1 + manhattan_distances(X, Y))
         elif similarity == "haversine":
-            self._similarity_matrix = (1 / (1 + haversine_distances(self._URM.T)))
+            return 1 / (1 + haversine_distances(X, Y))
         elif similarity == "chi2":
-            self._similarity_matrix = (1 / (1 + chi2_kernel(self._URM.T)))
+            return 1 / (1 + chi2_kernel(X, Y))
         elif similarity in ['cityblock', 'l1', 'l2']:
-            self._similarity_matrix = (1 / (1 + pairwise_distances(self._URM.T, metric=similarity)))
+            return 1 / (1 + pairwise_distances(X, Y, metric=similarity))
         elif similarity in ['braycurtis', 'canberra', 'chebyshev', 'correlation', 'dice', 'hamming', 'jaccard', 'kulsinski', 'mahalanobis', 'minkowski', 'rogerstanimoto', 'russellrao', 'seuclidean', 'sokalmichener', 'sokalsneath', 'sqeuclidean', 'yule']:
-
-            self._similarity_matrix = (1 / (1 + pairwise_distances(self._URM.T.toarray(), metric=similarity)))
+            return 1 / (1 + pairwise_distances(X.toarray(), Y.toarray(), metric=similarity))
         else:
             raise ValueError("Compute Similarity: value for parameter 'similarity' not recognized."
                              f"\nAllowed values are: {self.supported_similarities}, {self.supported_dissimilarities}."
@@ -154,24 +153,22 @@ class Similarity(object):
     #     local_top_k = real_values.argsort()[::-1]
     #     return [(real_indices[item], real_values[item]) for item in local_top_k]
 
-    def get_user_recs(self, u, mask, k):
-        user_id = self._data.public_users.get(u)
-        user_recs = self._preds[user_id]
-        # user_items = self._ratings[u].keys()
-        user_recs_mask = mask[user_id]
-        user_recs[~user_recs_mask] = -np.inf
-        indices, values = zip(*[(self._data.private_items.get(u_list[0]), u_list[1])
-                              for u_list in enumerate(user_recs)])
-
-        # indices, values = zip(*predictions.items())
-        indices = np.array(indices)
-        values = np.array(values)
-        local_k = min(k, len(values))
-        partially_ordered_preds_indices = np.argpartition(values, -local_k)[-local_k:]
-        real_values = values[partially_ordered_preds_indices]
-        real_indices = indices[partially_ordered_preds_indices]
-        local_top_k = real_values.argsort()[::-1]
-        return [(real_indices[item], real_values[item]) for item in local_top_k]
+    def predict(self, start, stop):
+        """
+        :return: scores of all the items for the users start:stop
+        """
+        return self._URM[start:stop].dot(self._W).toarray()
+
+    def get_top_k(self, preds, mask, k=100):
+        """
+        :return: (values, indices) of the k highest scores of the candidate items of each row, in decreasing order
+        """
+        preds = np.where(mask, preds, -np.inf)
+        k = min(k, preds.shape[1])
+        indices = np.argpartition(-preds, k - 1, axis=1)[:, :k]
+        values = np.take_along_axis(preds, indices, axis=1)
+        order = np.argsort(-values, axis=1, kind='stable')
+        return np.take_along_axis(values, order, axis=1), np.take_along_axis(indices, order, axis=1)
 
     # @staticmethod
     # def score_item(neighs, user_items):
@@ -181,14 +178,14 @@ class Similarity(object):
 
     def get_model_state(self):
         saving_dict = {}
-        saving_dict['_preds'] = self._preds
+        saving_dict['_W'] = self._W
         saving_dict['_similarity'] = self._similarity
         saving_dict['_num_neighbors'] = self._num_neighbors
         saving_dict['_implicit'] = self._implicit
         return saving_dict
 
     def set_model_state(self, saving_dict):
-        self._preds = saving_dict['_preds']
+        self._W = saving_dict['_W']
         self._similarity = saving_dict['_similarity']
         self._num_neighbors = saving_dict['_num_neighbors']
         self._implicit = saving_dict['_implicit']
@@ -128,24 +128,22 @@ class AiolliSimilarity(object):
         # self.pred_mat = w_sparse.dot(train).tolil()
         self.pred_mat = w_sparse.dot(train).toarray()
 
-    def get_user_recs(self, u, mask, k):
-        user_id = self._data.public_users.get(u)
-        user_recs = self.pred_mat[user_id]
-        # user_items = self._ratings[u].keys()
-        user_recs_mask = mask[user_id]
-        user_recs[~user_recs_mask] = -np.inf
-        indices, values = zip(*[(self._data.private_items.get(u_list[0]), u_list[1])
-                              for u_list in enumerate(user_recs)])
-
-        # indices, values = zip(*predictions.items())
-        indices = np.array(indices)
-        values = np.array(values)
-        local_k = min(k, len(values))
-        partially_ordered_preds_indices = np.argpartition(values, -local_k)[-local_k:]
-        real_values = values[partially_ordered_preds_indices]
-        real_indices = indices[partially_ordered_preds_indices]
-        local_top_k = real_values.argsort()[::-1]
-        return [(real_indices[item], real_values[item]) for item in local_top_k]
+    def predict(self, start, stop):
+        """
+        :return: scores of all the items for the users start:stop
+        """
+        return self.pred_mat[start:stop]
+
+    def get_top_k(self, preds, mask, k=100):
+        """
+        :return: (values, indices) of the k highest scores of the candidate items of each row, in decreasing order
+        """
+        preds = np.where(mask, preds, -np.inf)
+        k = min(k, preds.shape[1])
+        indices = np.argpartition(-preds, k - 1, axis=1)[:, :k]
+        values = np.take_along_axis(preds, indices, axis=1)
+        order = np.argsort(-values, axis=1, kind='stable')
+        return np.take_along_axis(values, order, axis=1), np.take_along_axis(indices, order, axis=1)
 
     # def get_user_recs(self, user, k=100):
     #     user_items = self._data.train_dict[user].keys()
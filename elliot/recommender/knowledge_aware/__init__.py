@@ -1,4 +1,8 @@
-from .kaHFM import KaHFM
-from .kaHFM_batch import KaHFMBatch
-from .kahfm_embeddings import KaHFMEmbeddings
-from .kgin import KGIN
\ No newline at end of file
+from elliot.utils.lazy_import import lazy_getattr
+
+__getattr__ = lazy_getattr(__name__, {
+    "KaHFM": ".kaHFM.KaHFM",
+    "KaHFMBatch": ".kaHFM_batch.KaHFMBatch",
+    "KaHFMEmbeddings": ".kahfm_embeddings.KaHFMEmbeddings",
+    "KGIN": ".kgin.KGIN",
+})
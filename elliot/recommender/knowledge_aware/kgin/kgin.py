@@ -8,19 +8,19 @@ __author__ = 'Antonio Ferrara'
 __email__ = 'antonio.ferrara@poliba.it'
 
 import numpy as np
+import pandas as pd
 import scipy.sparse as sp
 from tqdm import tqdm
-import networkx as nx
 import math
-from collections import defaultdict
 import random
 
-from elliot.dataset.samplers import custom_sampler as cs
+from elliot.dataset.samplers import csr_sampler as cs
 from elliot.recommender import BaseRecommenderModel
 from elliot.recommender.base_recommender_model import init_charger
 from elliot.recommender.knowledge_aware.kgin.kgin_model import KGINModel
 from elliot.recommender.recommender_utils_mixin import RecMixin
 from elliot.utils.write import store_recommendation
+from elliot.utils.artifact_cache import cached_artifact
 
 
 class KGIN(RecMixin, BaseRecommenderModel):
@@ -56,69 +56,20 @@ class KGIN(RecMixin, BaseRecommenderModel):
 
         self._sampler = cs.Sampler(self._data.i_train_dict)
 
-        ckg_graph = nx.MultiDiGraph()
-
         self.public_entities = {**self._data.public_items, **self._side.public_objects}  # questo lo devi prendere da loader di kgin
         self.private_entities = {**self._data.private_items, **self._side.private_objects}
 # srotolatore *iterabile = generato degli elementi , **iter = elementi dell'iterabile, ** = dict chiave-valore
+        # the graph only depends on the fold, so that it is built once for all the explored configurations
         print("Building the graph")
-        rd = defaultdict(list)
-        rd[0] = list(zip(*self._data.sp_i_train.nonzero()))
-
-        for h_id, r_id, t_id in tqdm(np.array(self._side.map_), ascii=True):
-            ckg_graph.add_edge(self.public_entities[h_id], self.public_entities[t_id], key=self._side.public_relations[r_id])
-            rd[self._side.public_relations[r_id]].append([self.public_entities[h_id], self.public_entities[t_id]])
+        edge_index, edge_type = cached_artifact(self._data, ("KGIN", "edges", self._loader), self._build_edges)
 
         print("Building adjacency matrix")
-
-        def _bi_norm_lap(adj):
-            # D^{-1/2}AD^{-1/2}
-            rowsum = np.array(adj.sum(1))
-
-            d_inv_sqrt = np.power(rowsum, -0.5, where=(rowsum != 0)).flatten()
-            # d_inv_sqrt[np.isinf(d_inv_sqrt)] = 0.
-            d_mat_inv_sqrt = sp.diags(d_inv_sqrt)
-
-            # bi_lap = adj.dot(d_mat_inv_sqrt).transpose().dot(d_mat_inv_sqrt)
-            bi_lap = d_mat_inv_sqrt.dot(adj).dot(d_mat_inv_sqrt)
-            return bi_lap.tocoo()
-
-        def _si_norm_lap(adj):
-            # D^{-1}A
-            rowsum = np.array(adj.sum(1))
-
-            d_inv = np.power(rowsum, -1, where=(rowsum != 0)).flatten()
-            # d_inv[np.isinf(d_inv)] = 0.
-            d_mat_inv = sp.diags(d_inv)
-
-            norm_adj = d_mat_inv.dot(adj)
-            return norm_adj.tocoo()
-
-        adj_mat_list = []
-        print("Begin to build sparse relation matrix ...")
-        for r_id in tqdm(rd.keys()):
-            np_mat = np.array(rd[r_id])
-            if r_id == 0:
-                cf = np_mat.copy()
-                cf[:, 1] = cf[:, 1] + len(self._data.users)  # [0, n_items) -> [n_users, n_users+n_items)
-                vals = [1.] * len(cf)
-                adj = sp.coo_matrix((vals, (cf[:, 0], cf[:, 1])),
-                                    shape=(self._side.n_nodes, self._side.n_nodes), dtype=np.float32)
-            else:
-                vals = [1.] * len(np_mat)
-                adj = sp.coo_matrix((vals, (np_mat[:, 0], np_mat[:, 1])),
-                                    shape=(self._side.n_nodes, self._side.n_nodes), dtype=np.float32)
-            adj_mat_list.append(adj)
-
-        norm_mat_list = [_bi_norm_lap(mat) for mat in adj_mat_list]
-        mean_mat_list = [_si_norm_lap(mat) for mat in adj_mat_list]
-        # interaction: user->item, [n_users, n_entities]
-        norm_mat_list[0] = norm_mat_list[0].tocsr()[:len(self._data.users), len(self._data.users):].tocoo()
-        mean_mat_list[0] = mean_mat_list[0].tocsr()[:len(self._data.users), len(self._data.users):].tocoo()
+        interact_mat = cached_artifact(self._data, ("KGIN", "interaction_matrix", self._loader),
+                                       self._build_interaction_matrix)
 
         self._model = KGINModel(self._num_users, self._num_items,
                                 self._side.n_relations, self._side.n_entities,
-                                mean_mat_list[0], ckg_graph,
+                                interact_mat, edge_index, edge_type,
                                 self._lr,
                                 self._l2, self._lfr,
                                 self._emb,
@@ -129,6 +80,31 @@ class KGIN(RecMixin, BaseRecommenderModel):
                                 self._ind,
                                 self._seed)
 
+    def _build_edges(self):
+        """
+        Map the KG triples to private ids
+        :return: [2, n_edges] heads and tails, [n_edges] relations of the distinct triples
+        """
+        # (subject, predicate, object) rows, either a DataFrame (KGINTSVLoader) or an array (KGINLoader)
+        kg = pd.DataFrame(np.asarray(self._side.map_), columns=['subject', 'predicate', 'object'])
+        heads = kg['subject'].map(self.public_entities).to_numpy(dtype=np.int64)
+        relations = kg['predicate'].map(self._side.public_relations).to_numpy(dtype=np.int64)
+        tails = kg['object'].map(self.public_entities).to_numpy(dtype=np.int64)
+        triples = np.unique(np.stack([heads, tails, relations], axis=1), axis=0)
+        return triples[:, :2].T, triples[:, 2]
+
+    def _build_interaction_matrix(self):
+        """
+        User-item interactions normalized by the user degree (D^{-1}A), over the columns of all the entities
+        """
+        interactions = self._data.sp_i_train.tocsr().astype(np.float32)
+        interactions.data[:] = 1.
+        rowsum = np.asarray(interactions.sum(1)).flatten()
+        d_inv = np.divide(1., rowsum, out=np.zeros_like(rowsum), where=(rowsum != 0))
+        interactions = sp.diags(d_inv).dot(interactions).tocoo()
+        return sp.coo_matrix((interactions.data, (interactions.row, interactions.col)),
+                             shape=(len(self._data.users), self._side.n_nodes - len(self._data.users)))
+
     @property
     def name(self):
         return "KGIN" \
@@ -207,7 +207,7 @@ class GraphConv:
 class KGINModel(keras.Model):
     def __init__(self,
                  n_users, n_items, n_relations, n_entities,
-                 adj_mat, graph,
+                 adj_mat, edge_index, edge_type,
                  lr,
                  decay, sim_decay,
                  emb_size,
@@ -241,8 +241,9 @@ class KGINModel(keras.Model):
         self.ind = ind
 
         self.adj_mat = adj_mat
-        self.graph = graph
-        self.edge_index, self.edge_type = self._get_edges(graph)
+        # [2, n_edges] heads and tails, [n_edges] relations
+        self.edge_index = tf.constant(edge_index, dtype=tf.int32)
+        self.edge_type = tf.constant(edge_type, dtype=tf.int32)
 
         self.initializer = tf.initializers.GlorotUniform(seed=random_seed)
         self.all_embed = tf.Variable(self.initializer(shape=[self.n_nodes, self.emb_size]))
@@ -271,13 +272,6 @@ class KGINModel(keras.Model):
         coo = X.tocoo()
         return tf.transpose(tf.constant([coo.row, coo.col], dtype=tf.int32))  # [-1, 2]
 
-    @tf.function
-    def _get_edges(self, graph):
-        graph_tensor = tf.constant(list(graph.edges))  # [-1, 3]
-        index = graph_tensor[:, :-1]  # [-1, 2]
-        type = graph_tensor[:, -1]  # [-1, 1]
-        return tf.cast(tf.transpose(index), dtype=tf.int32), tf.cast(type, dtype=tf.int32)
-
     @tf.function
     def call(self, inputs, training=None, **kwargs):
         # user = batch['users']
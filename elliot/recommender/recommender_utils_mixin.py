@@ -3,6 +3,7 @@ import os
 import numpy as np
 from tqdm import tqdm
 
+from elliot.dataset.candidate_mask import CandidateMask
 from elliot.utils.write import store_recommendation
 
 
@@ -82,11 +83,40 @@ class RecMixin(object):
                    self.get_single_recommendation(self.get_candidate_mask(), k, *args)
 
     def get_single_recommendation(self, mask, k, predictions, offset, offset_stop):
-        v, i = self._model.get_top_k(predictions, mask[offset: offset_stop], k=k)
+        if isinstance(mask, CandidateMask):
+            # -inf is scattered over the CSR indices of the batch, without building its dense mask
+            v, i = self.top_k(mask.mask(self.to_numpy(predictions), offset, offset_stop), k)
+        else:
+            v, i = self._model.get_top_k(predictions, mask[offset: offset_stop], k=k)
+            v, i = v.numpy(), i.numpy()
         items_ratings_pair = [list(zip(map(self._data.private_items.get, u_list[0]), u_list[1]))
-                              for u_list in list(zip(i.numpy(), v.numpy()))]
+                              for u_list in list(zip(i, v))]
         return dict(zip(map(self._data.private_users.get, range(offset, offset_stop)), items_ratings_pair))
 
+    @staticmethod
+    def to_numpy(predictions):
+        if hasattr(predictions, "detach"):
+            return predictions.detach().cpu().numpy()
+        return np.asarray(predictions)
+
+    @staticmethod
+    def top_k(scores, k):
+        """
+        Top-k of each row, equal scores are ranked by item index (the lowest first)
+        :return: (values, indices) of the k highest scores of each row, in decreasing order
+        """
+        k = min(k, scores.shape[1])
+        # k-th highest score of each row
+        threshold = -np.partition(-scores, k - 1, axis=1)[:, k - 1: k]
+        # all the scores above it, then the first items scoring exactly the threshold
+        above = scores > threshold
+        ties = scores == threshold
+        selected = above | (ties & (np.cumsum(ties, axis=1) <= k - above.sum(axis=1, keepdims=True)))
+        indices = np.nonzero(selected)[1].reshape(-1, k)
+        values = np.take_along_axis(scores, indices, axis=1)
+        order = np.lexsort((indices, -values))
+        return np.take_along_axis(values, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
     def restore_weights(self):
         try:
             self._model.load_weights(self._saving_filepath)
@@ -132,6 +162,9 @@ class RecMixin(object):
             if self._early_stopping.stop(self._losses[:], self._results):
                 self.logger.info(f"Met Early Stopping conditions: {self._early_stopping}")
                 break
+            elif self._pruning is not None and self._results and self._pruning(iteration, self.get_loss()):
+                self.logger.info(f"Pruned by the hyperparameter exploration after {iteration} epochs")
+                break
             else:
                 yield iteration
 
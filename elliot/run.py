@@ -18,6 +18,7 @@ import elliot.hyperoptimization as ho
 from elliot.namespace.namespace_model_builder import NameSpaceBuilder
 from elliot.result_handler.result_handler import ResultHandler, HyperParameterStudy, StatTest
 from elliot.utils import logging as logging_project
+from elliot.utils.artifact_cache import clear_artifacts
 
 _rstate = np.random.RandomState(42)
 here = path.abspath(path.dirname(__file__))
@@ -82,13 +83,24 @@ def run_experiment(config_path: str = ''):
             if isinstance(model_base, tuple):
                 logger.info(f"Tuning begun for {model_class.__name__}\n")
                 trials = Trials()
-                fmin(model_placeholder.objective,
-                     space=model_base[1],
-                     algo=model_base[3],
-                     trials=trials,
-                     verbose=False,
-                     rstate=_rstate,
-                     max_evals=model_base[2])
+                hyper_workers = getattr(model_base[0].meta, "hyper_workers", 1)
+                if hyper_workers > 1:
+                    ho.parallel_fmin(model_placeholder,
+                                     space=model_base[1],
+                                     algo=model_base[3],
+                                     max_evals=model_base[2],
+                                     trials=trials,
+                                     rstate=_rstate,
+                                     workers=hyper_workers,
+                                     threads=getattr(model_base[0].meta, "hyper_threads", None))
+                else:
+                    fmin(model_placeholder.objective,
+                         space=model_base[1],
+                         algo=model_base[3],
+                         trials=trials,
+                         verbose=False,
+                         rstate=_rstate,
+                         max_evals=model_base[2])
 
                 # argmin relativo alla combinazione migliore di iperparametri
                 min_val = np.argmin([i["result"]["loss"] for i in trials._trials])
@@ -123,6 +135,10 @@ def run_experiment(config_path: str = ''):
             logger.info(f"Best Model params:\t{best_model_params}")
             logger.info(f"Best Model results:\t{best_model_results}")
 
+            # the structures shared by the trials on this fold are not needed by the next model or fold
+            for data_obj in data_test:
+                clear_artifacts(data_obj)
+
         # Migliore sui test, aggiunta a performance totali
         min_val = np.argmin([i["loss"] for i in test_results])
 
@@ -246,6 +262,9 @@ def config_test(builder, base):
 
                     test_results.append(single)
 
+                for data_obj in data_test:
+                    clear_artifacts(data_obj)
+
             min_val = np.argmin([i["loss"] for i in test_results])
 
             res_handler.add_oneshot_recommender(**test_results[min_val])
@@ -0,0 +1,35 @@
+"""
+Module description:
+
+"""
+
+__version__ = '0.3.1'
+
+import weakref
+
+# DataSet -> {key: artifact}, released by clear_artifacts once the models of the fold are done with it
+_artifacts = weakref.WeakKeyDictionary()
+
+
+def cached_artifact(data, key, build):
+    """
+    Build an artifact derived from the training split and the side information of a DataSet only once,
+    so that the trials of a hyperparameter exploration reuse it on the same (dataset, fold).
+    Artifacts are shared by the models: they must not be modified in place.
+    :param data: DataSet of the fold
+    :param key: hashable key of the artifact, including the model and the hyperparameters it depends on
+    :param build: function building the artifact
+    :return: the artifact
+    """
+    artifacts = _artifacts.setdefault(data, {})
+    if key not in artifacts:
+        artifacts[key] = build()
+    return artifacts[key]
+
+
+def clear_artifacts(data):
+    """
+    Release the artifacts built on a DataSet, when the exploration of a model on its fold is over
+    :param data: DataSet of the fold
+    """
+    _artifacts.pop(data, None)
@@ -0,0 +1,37 @@
+"""
+Module description:
+
+"""
+
+__version__ = '0.3.1'
+
+import importlib
+import sys
+
+
+def import_attribute(path, package=None):
+    """
+    :param path: dotted path of a module attribute, e.g. elliot.recommender.knn.item_knn.item_knn.ItemKNN,
+    relative to package if it starts with a dot
+    :return: the attribute, after importing its module
+    """
+    module, name = path.rsplit(".", 1)
+    return getattr(importlib.import_module(module, package), name)
+
+
+def lazy_getattr(module_name, registry):
+    """
+    Build the module __getattr__ (PEP 562) of a package exposing models or loaders by name,
+    so that each of them, and its dependencies, is imported only when it is first requested
+    :param module_name: __name__ of the package
+    :param registry: {name: dotted path of the attribute}
+    :return: the __getattr__ function of the package
+    """
+    def __getattr__(name):
+        if name not in registry:
+            raise AttributeError(f"module '{module_name}' has no attribute '{name}'")
+        value = import_attribute(registry[name], module_name)
+        setattr(sys.modules[module_name], name, value)
+        return value
+
+    return __getattr__
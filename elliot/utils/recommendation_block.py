@@ -0,0 +1,89 @@
+"""
+Module description:
+
+"""
+
+__version__ = '0.3.1'
+
+from collections.abc import Mapping
+
+import numpy as np
+
+
+class RecommendationBlock(Mapping):
+    """
+    Top-k recommendations of a set of users, stored as arrays over the private ids.
+
+    The block is a read-only {public user: [(public item, score), ...]} mapping, whose lists are built on access only,
+    so that the metrics working on dictionaries keep working, while the evaluator and the writer use the arrays.
+    """
+
+    def __init__(self, users, items, scores, private_users, private_items):
+        """
+        :param users: private user ids (n)
+        :param items: n x k matrix of private item ids, sorted by decreasing score
+        :param scores: n x k matrix of scores
+        :param private_users: private to public user ids
+        :param private_items: private to public item ids
+        """
+        self.users = np.asarray(users, dtype=np.int64)
+        self.item_indices = np.asarray(items, dtype=np.int64).reshape(len(self.users), -1)
+        self.scores = np.asarray(scores).reshape(len(self.users), -1)
+        self.private_users = private_users
+        self.private_items = private_items
+        self._rows = None
+
+    @classmethod
+    def concatenate(cls, blocks):
+        """
+        Stack the blocks of consecutive batches of users
+        :return: a single block, or an empty dictionary if there is no block
+        """
+        blocks = [b for b in blocks if isinstance(b, RecommendationBlock)]
+        if not blocks:
+            return {}
+        return cls(np.concatenate([b.users for b in blocks]),
+                   np.concatenate([b.item_indices for b in blocks]),
+                   np.concatenate([b.scores for b in blocks]),
+                   blocks[0].private_users, blocks[0].private_items)
+
+    def select(self, rows):
+        """
+        :param rows: boolean mask or indices of the rows to keep
+        :return: a block with the selected users only
+        """
+        return RecommendationBlock(self.users[rows], self.item_indices[rows], self.scores[rows],
+                                   self.private_users, self.private_items)
+
+    def public_users(self):
+        return [self.private_users[u] for u in self.users.tolist()]
+
+    def to_public(self):
+        """
+        :return: (public users, public items, scores) flat arrays with one entry per recommendation
+        """
+        public_items = np.array([self.private_items[i] for i in range(len(self.private_items))])
+        users = np.repeat(np.array(self.public_users()), self.item_indices.shape[1])
+        return users, public_items[self.item_indices.ravel()], self.scores.ravel()
+
+    def _row(self, user):
+        if self._rows is None:
+            self._rows = dict(zip(self.public_users(), range(len(self.users))))
+        return self._rows[user]
+
+    def __getitem__(self, user):
+        row = self._row(user)
+        return list(zip(map(self.private_items.get, self.item_indices[row].tolist()), self.scores[row]))
+
+    def __iter__(self):
+        return iter(self.public_users())
+
+    def __len__(self):
+        return len(self.users)
+
+    def __contains__(self, user):
+        try:
+            self._row(user)
+        except KeyError:
+            return False
+        return True
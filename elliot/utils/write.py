@@ -8,8 +8,11 @@ __author__ = 'Vito Walter Anelli, Claudio Pomo'
 __email__ = 'vitowalter.anelli@poliba.it, claudio.pomo@poliba.it'
 
 import numpy as np
+import pandas as pd
 import pickle
 
+from elliot.utils.recommendation_block import RecommendationBlock
+
 
 def save_obj(obj, name):
     """
@@ -35,8 +38,15 @@ def save_np(npy, filename):
 def store_recommendation(recommendations, path=""):
     """
     Store recommendation list (top-k)
+    :param recommendations: {user: [(item, score), ...]} dictionary or RecommendationBlock
     :return:
     """
+    if isinstance(recommendations, RecommendationBlock):
+        # public ids are resolved here only, and the whole block is written at once
+        users, items, scores = recommendations.to_public()
+        pd.DataFrame({'user': users, 'item': items, 'score': scores}).to_csv(path, sep='\t', header=False,
+                                                                            index=False)
+        return
 
     with open(path, 'w') as out:
         for u, recs in recommendations.items():
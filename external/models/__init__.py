@@ -8,23 +8,39 @@ def import_model_by_backend(tensorflow_cmd, pytorch_cmd):
             break
 
 
-from .most_popular import MostPop
-from .Proxy import ProxyRecommender
+import sys
 
-from .ktup import KTUP
-from .cke import CKE
-from .cofm import CoFM
+from elliot.utils.lazy_import import lazy_getattr
 
-import sys
+# models are imported only when the configuration asks for them (e.g. external.KGTORE),
+# so that a PyTorch model does not load TensorFlow and vice versa
+_models = {
+    "MostPop": ".most_popular.MostPop",
+    "ProxyRecommender": ".Proxy.ProxyRecommender",
+    "KTUP": ".ktup.KTUP",
+    "CKE": ".cke.CKE",
+    "CoFM": ".cofm.CoFM",
+}
+
+_backend_models = {
+    "tensorflow": {
+        "KGFlex": ".kgflex.KGFlex",
+    },
+    "pytorch": {
+        "LightGCN": ".lightgcn.LightGCN.LightGCN",
+        "DGCF": ".dgcf.DGCF.DGCF",
+        "BPRMF": ".bprmf.BPRMF.BPRMF",
+        "LightGCNEdge": ".lightgcn_edge.LightGCNEdge",
+        "KGTORE": ".kgtore.KGTORE.KGTORE",
+        "KGCN": ".kgcn.KGCN",
+        "KGAT": ".kgat.KGAT",
+    },
+}
 
 for _backend in sys.modules["external"].backend:
     if _backend == "tensorflow":
-        from .kgflex import KGFlex
+        _models.update(_backend_models["tensorflow"])
     elif _backend == "pytorch":
-        from .lightgcn.LightGCN import LightGCN
-        from .dgcf.DGCF import DGCF
-        from .bprmf.BPRMF import BPRMF
-        from .lightgcn_edge import LightGCNEdge
-        from .kgtore.KGTORE import KGTORE
-        from .kgcn import KGCN
-        from .kgat import KGAT
+        _models.update(_backend_models["pytorch"])
+
+__getattr__ = lazy_getattr(__name__, _models)
@@ -7,13 +7,15 @@ __version__ = '0.3.1'
 __author__ = 'Vito Walter Anelli, Claudio Pomo, Daniele Malitesta'
 __email__ = 'vitowalter.anelli@poliba.it, claudio.pomo@poliba.it, daniele.malitesta@poliba.it'
 
+import numpy as np
 import torch
 import os
 from tqdm import tqdm
 import math
 
-from elliot.dataset.samplers import custom_sampler as cs
+from elliot.dataset.samplers import csr_sampler as cs
 from elliot.utils.write import store_recommendation
+from elliot.utils.recommendation_block import RecommendationBlock
 
 from elliot.recommender import BaseRecommenderModel
 from .BPRMFModel import BPRMFModel
@@ -108,21 +110,21 @@ class BPRMF(RecMixin, BaseRecommenderModel):
             self.evaluate(it, loss / (it + 1))
 
     def get_recommendations(self, k: int = 100):
-        predictions_top_k_test = {}
-        predictions_top_k_val = {}
+        predictions_top_k_test = []
+        predictions_top_k_val = []
         for index, offset in enumerate(range(0, self._num_users, self._batch_size)):
             offset_stop = min(offset + self._batch_size, self._num_users)
             predictions = self._model.predict(offset, offset_stop)
             recs_val, recs_test = self.process_protocol(k, predictions, offset, offset_stop)
-            predictions_top_k_val.update(recs_val)
-            predictions_top_k_test.update(recs_test)
-        return predictions_top_k_val, predictions_top_k_test
+            predictions_top_k_val.append(recs_val)
+            predictions_top_k_test.append(recs_test)
+        return RecommendationBlock.concatenate(predictions_top_k_val), \
+               RecommendationBlock.concatenate(predictions_top_k_test)
 
     def get_single_recommendation(self, mask, k, predictions, offset, offset_stop):
         v, i = self._model.get_top_k(predictions, mask[offset: offset_stop], k=k)
-        items_ratings_pair = [list(zip(map(self._data.private_items.get, u_list[0]), u_list[1]))
-                              for u_list in list(zip(i.detach().cpu().numpy(), v.detach().cpu().numpy()))]
-        return dict(zip(map(self._data.private_users.get, range(offset, offset_stop)), items_ratings_pair))
+        return RecommendationBlock(np.arange(offset, offset_stop), i.detach().cpu().numpy(), v.detach().cpu().numpy(),
+                                   self._data.private_users, self._data.private_items)
 
     def evaluate(self, it=None, loss=0):
         if (it is None) or (not (it + 1) % self._validation_rate):
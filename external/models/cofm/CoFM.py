@@ -18,7 +18,7 @@ from elliot.recommender import BaseRecommenderModel
 from elliot.recommender.base_recommender_model import init_charger
 from elliot.recommender.recommender_utils_mixin import RecMixin
 from . import rating_sampler as rs
-from . import triple_sampler as ts
+from elliot.dataset.samplers import kg_triple_sampler as ts
 from .CoFMMOdel import cofm
 
 np.random.seed(42)
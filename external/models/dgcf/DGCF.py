@@ -14,7 +14,9 @@ import os
 import math
 
 from elliot.utils.write import store_recommendation
+from elliot.utils.recommendation_block import RecommendationBlock
 from elliot.dataset.samplers import custom_sampler as cs
+from elliot.dataset.samplers.prefetch_sampler import PrefetchSampler
 from elliot.recommender import BaseRecommenderModel
 from elliot.recommender.base_recommender_model import init_charger
 from elliot.recommender.recommender_utils_mixin import RecMixin
@@ -62,6 +64,7 @@ class DGCF(RecMixin, BaseRecommenderModel):
     def __init__(self, data, config, params, *args, **kwargs):
 
         self._sampler = cs.Sampler(self._data.i_train_dict)
+        self._sampler = PrefetchSampler.from_meta(self._sampler, self._params.meta, self._seed)
 
         if self._batch_size < 1:
             self._batch_size = self._num_users
@@ -126,8 +129,8 @@ class DGCF(RecMixin, BaseRecommenderModel):
             self.evaluate(it, loss / (it + 1))
 
     def get_recommendations(self, k: int = 100):
-        predictions_top_k_test = {}
-        predictions_top_k_val = {}
+        predictions_top_k_test = []
+        predictions_top_k_val = []
         gu, gi = self._model.propagate_embeddings(evaluate=True)
         gu, gi = torch.reshape(gu, (gu.shape[0], gu.shape[1] * gu.shape[2])), torch.reshape(gi, (
             gi.shape[0], gi.shape[1] * gi.shape[2]))
@@ -135,15 +138,15 @@ class DGCF(RecMixin, BaseRecommenderModel):
             offset_stop = min(offset + self._batch_size, self._num_users)
             predictions = self._model.predict(gu[offset: offset_stop], gi)
             recs_val, recs_test = self.process_protocol(k, predictions, offset, offset_stop)
-            predictions_top_k_val.update(recs_val)
-            predictions_top_k_test.update(recs_test)
-        return predictions_top_k_val, predictions_top_k_test
+            predictions_top_k_val.append(recs_val)
+            predictions_top_k_test.append(recs_test)
+        return RecommendationBlock.concatenate(predictions_top_k_val), \
+               RecommendationBlock.concatenate(predictions_top_k_test)
 
     def get_single_recommendation(self, mask, k, predictions, offset, offset_stop):
         v, i = self._model.get_top_k(predictions, mask[offset: offset_stop], k=k)
-        items_ratings_pair = [list(zip(map(self._data.private_items.get, u_list[0]), u_list[1]))
-                              for u_list in list(zip(i.detach().cpu().numpy(), v.detach().cpu().numpy()))]
-        return dict(zip(map(self._data.private_users.get, range(offset, offset_stop)), items_ratings_pair))
+        return RecommendationBlock(np.arange(offset, offset_stop), i.detach().cpu().numpy(), v.detach().cpu().numpy(),
+                                   self._data.private_users, self._data.private_items)
 
     def evaluate(self, it=None, loss=0):
         if (it is None) or (not (it + 1) % self._validation_rate):
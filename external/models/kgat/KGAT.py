@@ -1,4 +1,5 @@
 from tqdm import tqdm
+import numpy as np
 import torch
 import os
 import pandas as pd
@@ -7,7 +8,10 @@ import math
 from operator import itemgetter
 
 from elliot.utils.write import store_recommendation
+from elliot.utils.artifact_cache import cached_artifact
+from elliot.utils.recommendation_block import RecommendationBlock
 from .custom_sampler import Sampler
+from elliot.dataset.samplers.prefetch_sampler import PrefetchSampler
 from elliot.recommender import BaseRecommenderModel
 from elliot.recommender.base_recommender_model import init_charger
 from elliot.recommender.recommender_utils_mixin import RecMixin
@@ -40,22 +44,19 @@ class KGAT(RecMixin, BaseRecommenderModel):
                                 **self._side.public_objects}
         self.private_entities = {**self._data.private_items, **self._side.private_objects}
         self.items = list(self._data.public_items.values())
-        mapped_subjects = list(itemgetter(*self._side.map_['subject'].tolist())(self.public_entities))
-        mapped_objects = list(itemgetter(*self._side.map_['object'].tolist())(self.public_entities))
-        mapped_relations = list(itemgetter(*self._side.map_['predicate'].tolist())(self._side.public_relations))
-
-        kg_graph = pd.concat([pd.Series(mapped_subjects), pd.Series(mapped_relations), pd.Series(mapped_objects)],
-                             axis=1)
-        kg_graph.columns = ['subject', 'predicate', 'object']
+        # the KG structures only depend on the fold, so that they are built once for all the explored configurations
+        mapped_subjects, mapped_objects, mapped_relations, kg_graph, dgl_graph = cached_artifact(
+            self._data, ("KGAT", "kg_graph", self._loader), self._build_kg_graph)
 
         self._sampler = Sampler(self._data.i_train_dict, kg_graph)
+        self._sampler = PrefetchSampler.from_meta(self._sampler, self._params.meta, self._seed)
         if self._batch_size < 1:
             self._batch_size = self._num_users
 
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-
-        dgl_graph = dgl.graph((torch.tensor(mapped_subjects).to(device), torch.tensor(mapped_objects).to(device)))
-        dgl_graph.edata['relation_id'] = torch.tensor(mapped_relations).to(device)
+        adjacency = cached_artifact(self._data, ("KGAT", "adjacency", self._loader),
+                                    lambda: KGATModel.normalized_adjacency(
+                                        dgl_graph, self._side.n_relations - 1,
+                                        torch.Size([self._num_users + self._side.n_entities] * 2), dgl_graph.device))
 
         self._model = KGATModel(
             num_users=self._num_users,
@@ -73,8 +74,27 @@ class KGAT(RecMixin, BaseRecommenderModel):
             cols=mapped_objects,
             data=mapped_relations,
             random_seed=self._seed,
+            adjacency=adjacency
         )
 
+    def _build_kg_graph(self):
+        """
+        :return: private subjects, objects and relations of the KG triples, as lists, as a DataFrame and as a DGL graph
+        """
+        mapped_subjects = list(itemgetter(*self._side.map_['subject'].tolist())(self.public_entities))
+        mapped_objects = list(itemgetter(*self._side.map_['object'].tolist())(self.public_entities))
+        mapped_relations = list(itemgetter(*self._side.map_['predicate'].tolist())(self._side.public_relations))
+
+        kg_graph = pd.concat([pd.Series(mapped_subjects), pd.Series(mapped_relations), pd.Series(mapped_objects)],
+                             axis=1)
+        kg_graph.columns = ['subject', 'predicate', 'object']
+
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+        dgl_graph = dgl.graph((torch.tensor(mapped_subjects).to(device), torch.tensor(mapped_objects).to(device)))
+        dgl_graph.edata['relation_id'] = torch.tensor(mapped_relations).to(device)
+        return mapped_subjects, mapped_objects, mapped_relations, kg_graph, dgl_graph
+
     @property
     def name(self):
         return "KGAT" \
@@ -102,21 +122,21 @@ class KGAT(RecMixin, BaseRecommenderModel):
             self._model.update_attentive_A()
 
     def get_recommendations(self, k: int = 100):
-        predictions_top_k_test = {}
-        predictions_top_k_val = {}
+        predictions_top_k_test = []
+        predictions_top_k_val = []
         for index, offset in enumerate(range(0, self._num_users, self._batch_size)):
             offset_stop = min(offset + self._batch_size, self._num_users)
             predictions = self._model.predict(torch.tensor(list(range(offset, offset_stop)), dtype=torch.int64), self.items)
             recs_val, recs_test = self.process_protocol(k, predictions, offset, offset_stop)
-            predictions_top_k_val.update(recs_val)
-            predictions_top_k_test.update(recs_test)
-        return predictions_top_k_val, predictions_top_k_test
+            predictions_top_k_val.append(recs_val)
+            predictions_top_k_test.append(recs_test)
+        return RecommendationBlock.concatenate(predictions_top_k_val), \
+               RecommendationBlock.concatenate(predictions_top_k_test)
 
     def get_single_recommendation(self, mask, k, predictions, offset, offset_stop):
         v, i = self._model.get_top_k(predictions, mask[offset: offset_stop], k=k)
-        items_ratings_pair = [list(zip(map(self._data.private_items.get, u_list[0]), u_list[1]))
-                              for u_list in list(zip(i.detach().cpu().numpy(), v.detach().cpu().numpy()))]
-        return dict(zip(map(self._data.private_users.get, range(offset, offset_stop)), items_ratings_pair))
+        return RecommendationBlock(np.arange(offset, offset_stop), i.detach().cpu().numpy(), v.detach().cpu().numpy(),
+                                   self._data.private_users, self._data.private_items)
 
     def evaluate(self, it=None, loss=0):
         if (it is None) or (not (it + 1) % self._validation_rate):
@@ -24,6 +24,7 @@ class KGATModel(torch.nn.Module, ABC):
                  cols,
                  data,
                  random_seed,
+                 adjacency=None,
                  name="KGAT",
                  **kwargs
                  ):
@@ -58,9 +59,8 @@ class KGATModel(torch.nn.Module, ABC):
             [self.num_users + self.num_entities, self.num_users + self.num_entities]
         )
 
-        self.A_in = (
-            self.init_graph()
-        )
+        # the normalized KG adjacency may be given, when already built for the same graph
+        self.A_in = adjacency if adjacency is not None else self.init_graph()
 
         self.user_embedding = torch.nn.Embedding(self.num_users, self.embed_k)
         torch.nn.init.xavier_uniform_(self.user_embedding.weight)
@@ -92,13 +92,20 @@ class KGATModel(torch.nn.Module, ABC):
         self.optimizer = torch.optim.Adam(self.parameters(), lr=self.learning_rate)
 
     def init_graph(self):
+        return self.normalized_adjacency(self.kg_graph, self.num_relations, self.matrix_size, self.device)
+
+    @staticmethod
+    def normalized_adjacency(kg_graph, num_relations, matrix_size, device):
+        """
+        :return: sum of the row-normalized adjacency matrices of the relations, as a sparse tensor
+        """
         adj_list = []
-        for rel_type in range(1, self.num_relations, 1):
-            edge_idxs = self.kg_graph.filter_edges(
+        for rel_type in range(1, num_relations, 1):
+            edge_idxs = kg_graph.filter_edges(
                 lambda edge: edge.data["relation_id"] == rel_type
             )
             sub_graph = (
-                dgl.edge_subgraph(self.kg_graph, edge_idxs, preserve_nodes=True)
+                dgl.edge_subgraph(kg_graph, edge_idxs, preserve_nodes=True)
                     .adjacency_matrix(transpose=False, scipy_fmt="coo")
                     .astype("float")
             )
@@ -113,8 +120,8 @@ class KGATModel(torch.nn.Module, ABC):
         final_adj_matrix = sum(adj_list).tocoo()
         indices = torch.LongTensor(np.array([final_adj_matrix.row, final_adj_matrix.col]))
         values = torch.FloatTensor(final_adj_matrix.data)
-        adj_matrix_tensor = torch.sparse.FloatTensor(indices, values, self.matrix_size)
-        return adj_matrix_tensor.to(self.device)
+        adj_matrix_tensor = torch.sparse.FloatTensor(indices, values, matrix_size)
+        return adj_matrix_tensor.to(device)
 
     def _get_ego_embeddings(self):
         user_embeddings = self.user_embedding.weight
@@ -203,10 +210,10 @@ class KGATModel(torch.nn.Module, ABC):
 
         # loss kg
         h, r, pos_t, neg_t = batch_kg
-        h_e, r_e, pos_t_e, neg_t_e = self._get_kg_embedding(torch.tensor(h, dtype=torch.int64, device=self.device),
-                                                            torch.tensor(r, dtype=torch.int64, device=self.device),
-                                                            torch.tensor(pos_t, dtype=torch.int64, device=self.device),
-                                                            torch.tensor(neg_t, dtype=torch.int64, device=self.device))
+        h_e, r_e, pos_t_e, neg_t_e = self._get_kg_embedding(torch.as_tensor(h, dtype=torch.int64, device=self.device),
+                                                            torch.as_tensor(r, dtype=torch.int64, device=self.device),
+                                                            torch.as_tensor(pos_t, dtype=torch.int64, device=self.device),
+                                                            torch.as_tensor(neg_t, dtype=torch.int64, device=self.device))
         pos_tail_score = ((h_e + r_e - pos_t_e) ** 2).sum(dim=1)
         neg_tail_score = ((h_e + r_e - neg_t_e) ** 2).sum(dim=1)
         kg_loss = self.softplus(pos_tail_score - neg_tail_score).mean()
@@ -9,58 +9,53 @@ __email__ = 'vitowalter.anelli@poliba.it, claudio.pomo@poliba.it'
 
 import numpy as np
 
+from elliot.dataset.samplers import csr_sampler
+
 
 class Sampler:
+    """
+    Sampler of the (user, positive item, negative item) and (head, relation, positive tail, negative tail) batches.
+    The user-item side is drawn by the vectorized BPR sampler, while the KG side uses a CSR index from each head
+    to its (relation, tail) pairs, sorted by tail, so that corrupted tails are rejected with a sorted search.
+    """
     def __init__(self, indexed_ratings, kg, seed=42):
-        np.random.seed(seed)
-        self._indexed_ratings = indexed_ratings
-        self._users = list(self._indexed_ratings.keys())
-        self._nusers = len(self._users)
-        self._items = list({k for a in self._indexed_ratings.values() for k in a.keys()})
-        self._nitems = len(self._items)
-        self._ui_dict = {u: list(set(indexed_ratings[u])) for u in indexed_ratings}
+        self._ui_sampler = csr_sampler.Sampler(indexed_ratings, seed)
         self._kg = kg
-        self._lkg_dict = {s: len(self._kg[self._kg['subject'] == s]) for s in self._kg['subject'].unique().tolist()}
-        self._n_heads = self._kg['subject'].nunique()
-        self._n_tails = self._kg['object'].nunique()
-        self._lui_dict = {u: len(v) for u, v in self._ui_dict.items()}
+        heads, relations, tails = (kg[c].to_numpy(dtype=np.int64) for c in ('subject', 'predicate', 'object'))
+        self._n_tails = kg['object'].nunique()
+        self._width = max(self._n_tails, tails.max(initial=-1) + 1)
+
+        order = np.lexsort((tails, heads))
+        self._relations, self._tails = relations[order], tails[order]
+        self._kg_indptr = np.searchsorted(heads[order], np.arange(heads.max(initial=-1) + 2))
+        # distinct (head, tail) pairs, whatever the relation, are never used as corrupted triples
+        self._kg_keys = np.unique(heads * self._width + tails)
+        n_linked_tails = np.diff(np.searchsorted(self._kg_keys, np.arange(heads.max(initial=-1) + 2) * self._width))
+        self._heads = np.flatnonzero((np.diff(self._kg_indptr) > 0) & (n_linked_tails < self._n_tails))
+
+    def is_linked(self, heads, tails):
+        keys = heads * self._width + tails
+        position = np.minimum(np.searchsorted(self._kg_keys, keys), len(self._kg_keys) - 1)
+        return self._kg_keys[position] == keys
+
+    def sample_kg(self, n, random_state=np.random):
+        r_int = random_state.randint
+        h = self._heads[r_int(len(self._heads), size=n)]
+        start, stop = self._kg_indptr[h], self._kg_indptr[h + 1]
+        triples = start + r_int(0, stop - start)
+        p, t_pos = self._relations[triples], self._tails[triples]
+
+        t_neg = r_int(self._n_tails, size=n)
+        rejected = np.flatnonzero(self.is_linked(h, t_neg))
+        while len(rejected):
+            t_neg[rejected] = r_int(self._n_tails, size=len(rejected))
+            rejected = rejected[self.is_linked(h[rejected], t_neg[rejected])]
+        return h, p, t_pos, t_neg
+
+    def batch(self, n, random_state=np.random):
+        h, p, tp, tn = self.sample_kg(n, random_state)
+        return self._ui_sampler.batch(n, random_state), (h[:, None], p[:, None], tp[:, None], tn[:, None])
 
     def step(self, events: int, batch_size: int):
-        r_int = np.random.randint
-        n_users = self._nusers
-        n_items = self._nitems
-        ui_dict = self._ui_dict
-        lui_dict = self._lui_dict
-        lkg_dict = self._lkg_dict
-        n_heads = self._n_heads
-        n_tails = self._n_tails
-        kg = self._kg
-
-        def sample():
-            u = r_int(n_users)
-            ui = ui_dict[u]
-            lui = lui_dict[u]
-            if lui == n_items:
-                sample()
-            i = ui[r_int(lui)]
-
-            j = r_int(n_items)
-            while j in ui:
-                j = r_int(n_items)
-
-            try:
-                s = r_int(n_heads)
-                all_object_s = kg[kg['subject'] == s]['object'].tolist()
-                p_s = kg[kg['subject'] == s]['predicate'].tolist()[r_int(lkg_dict[s])]
-                o_i = kg[(kg['subject'] == s) & (kg['predicate'] == p_s)]['object'].values[0]
-                o_j = r_int(n_tails)
-                while o_j in all_object_s:
-                    o_j = r_int(n_tails)
-            except:
-                print()
-
-            return u, i, j, s, p_s, o_i, o_j
-
         for batch_start in range(0, events, batch_size):
-            bui, bii, bij, h, p, tp, tn = map(np.array, zip(*[sample() for _ in range(batch_start, min(batch_start + batch_size, events))]))
-            yield (bui[:, None], bii[:, None], bij[:, None]), (h[:, None], p[:, None], tp[:, None], tn[:, None])
+            yield self.batch(min(batch_start + batch_size, events) - batch_start)
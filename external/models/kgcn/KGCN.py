@@ -6,7 +6,10 @@ from operator import itemgetter
 import math
 
 from elliot.utils.write import store_recommendation
+from elliot.utils.artifact_cache import cached_artifact
+from elliot.utils.recommendation_block import RecommendationBlock
 from elliot.dataset.samplers import custom_sampler as cs
+from elliot.dataset.samplers.prefetch_sampler import PrefetchSampler
 from elliot.recommender import BaseRecommenderModel
 from elliot.recommender.base_recommender_model import init_charger
 from elliot.recommender.recommender_utils_mixin import RecMixin
@@ -20,6 +23,7 @@ class KGCN(RecMixin, BaseRecommenderModel):
     def __init__(self, data, config, params, *args, **kwargs):
 
         self._sampler = cs.Sampler(self._data.i_train_dict)
+        self._sampler = PrefetchSampler.from_meta(self._sampler, self._params.meta, self._seed)
         if self._batch_size < 1:
             self._batch_size = self._num_users
 
@@ -37,17 +41,14 @@ class KGCN(RecMixin, BaseRecommenderModel):
         ]
 
         self.autoset_params()
+        # re-sample the neighborhoods every neighbor_resample epochs (0 keeps the initial ones)
+        self._neighbor_resample = getattr(self._params, "neighbor_resample", 0)
         self._side = getattr(self._data.side_information, self._loader, None)
         self.public_entities = {**self._data.public_items,
                                 **self._side.public_objects}
         self.private_entities = {**self._data.private_items, **self._side.private_objects}
-        mapped_subjects = list(itemgetter(*self._side.map_['subject'].tolist())(self.public_entities))
-        mapped_objects = list(itemgetter(*self._side.map_['object'].tolist())(self.public_entities))
-        mapped_relations = list(itemgetter(*self._side.map_['predicate'].tolist())(self._side.public_relations))
-
-        kg_graph = sparse.coo_matrix((mapped_relations,
-                                      (mapped_subjects, mapped_objects)),
-                                     shape=(self._side.n_entities, self._side.n_entities))
+        # the KG adjacency only depends on the fold, so that it is built once for all the explored configurations
+        kg_graph = cached_artifact(self._data, ("KGCN", "kg_graph", self._loader), self._build_kg_graph)
 
         self._model = KGCNModel(
             num_users=self._num_users,
@@ -63,6 +64,17 @@ class KGCN(RecMixin, BaseRecommenderModel):
             random_seed=self._seed
         )
 
+    def _build_kg_graph(self):
+        """
+        :return: entities x entities sparse matrix of the relations
+        """
+        mapped_subjects = list(itemgetter(*self._side.map_['subject'].tolist())(self.public_entities))
+        mapped_objects = list(itemgetter(*self._side.map_['object'].tolist())(self.public_entities))
+        mapped_relations = list(itemgetter(*self._side.map_['predicate'].tolist())(self._side.public_relations))
+        return sparse.coo_matrix((mapped_relations,
+                                  (mapped_subjects, mapped_objects)),
+                                 shape=(self._side.n_entities, self._side.n_entities))
+
     @property
     def name(self):
         return "KGCN" \
@@ -88,10 +100,12 @@ class KGCN(RecMixin, BaseRecommenderModel):
                     t.update()
 
             self.evaluate(it, loss / (it + 1))
+            if self._neighbor_resample and not (it + 1) % self._neighbor_resample:
+                self._model.resample_neighbors()
 
     def get_recommendations(self, k: int = 100):
-        predictions_top_k_test = {}
-        predictions_top_k_val = {}
+        predictions_top_k_test = []
+        predictions_top_k_val = []
         for index, offset in enumerate(range(0, self._num_users, self._batch_eval)):
             offset_stop = min(offset + self._batch_eval, self._num_users)
             predictions = np.empty((offset_stop - offset, self._num_items))
@@ -104,15 +118,15 @@ class KGCN(RecMixin, BaseRecommenderModel):
                                         offset_stop - offset, item_offset_stop - item_offset)
                 predictions[:, item_offset: item_offset_stop] = p.detach().cpu().numpy()
             recs_val, recs_test = self.process_protocol(k, predictions, offset, offset_stop)
-            predictions_top_k_val.update(recs_val)
-            predictions_top_k_test.update(recs_test)
-        return predictions_top_k_val, predictions_top_k_test
+            predictions_top_k_val.append(recs_val)
+            predictions_top_k_test.append(recs_test)
+        return RecommendationBlock.concatenate(predictions_top_k_val), \
+               RecommendationBlock.concatenate(predictions_top_k_test)
 
     def get_single_recommendation(self, mask, k, predictions, offset, offset_stop):
         v, i = self._model.get_top_k(predictions, mask[offset: offset_stop], k=k)
-        items_ratings_pair = [list(zip(map(self._data.private_items.get, u_list[0]), u_list[1]))
-                              for u_list in list(zip(i.detach().cpu().numpy(), v.detach().cpu().numpy()))]
-        return dict(zip(map(self._data.private_users.get, range(offset, offset_stop)), items_ratings_pair))
+        return RecommendationBlock(np.arange(offset, offset_stop), i.detach().cpu().numpy(), v.detach().cpu().numpy(),
+                                   self._data.private_users, self._data.private_items)
 
     def evaluate(self, it=None, loss=0):
         if (it is None) or (not (it + 1) % self._validation_rate):
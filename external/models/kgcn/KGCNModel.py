@@ -80,46 +80,57 @@ class KGCNModel(torch.nn.Module, ABC):
         self.optimizer = torch.optim.Adam(self.parameters(), lr=self.learning_rate)
 
     def construct_adj(self, kg_graph):
-        kg_dict = dict()
-        for triple in zip(kg_graph.row, kg_graph.data, kg_graph.col):
-            head = triple[0]
-            relation = triple[1]
-            tail = triple[2]
-            if head not in kg_dict:
-                kg_dict[head] = []
-            kg_dict[head].append((tail, relation))
-            if tail not in kg_dict:
-                kg_dict[tail] = []
-            kg_dict[tail].append((head, relation))
-
-        entity_num = kg_graph.shape[0]
-        adj_entity = np.zeros([entity_num, self.neighbor_sample_size], dtype=np.int64)
-        adj_relation = np.zeros([entity_num, self.neighbor_sample_size], dtype=np.int64)
-        for entity in range(entity_num):
-            if entity not in kg_dict.keys():
-                adj_entity[entity] = np.array([entity] * self.neighbor_sample_size)
-                adj_relation[entity] = np.array([0] * self.neighbor_sample_size)
-                continue
-
-            neighbors = kg_dict[entity]
-            n_neighbors = len(neighbors)
-            if n_neighbors >= self.neighbor_sample_size:
-                sampled_indices = np.random.choice(
-                    list(range(n_neighbors)),
-                    size=self.neighbor_sample_size,
-                    replace=False,
-                )
-            else:
-                sampled_indices = np.random.choice(
-                    list(range(n_neighbors)),
-                    size=self.neighbor_sample_size,
-                    replace=True,
-                )
-            adj_entity[entity] = np.array([neighbors[i][0] for i in sampled_indices])
-            adj_relation[entity] = np.array([neighbors[i][1] for i in sampled_indices])
+        """
+        Index the undirected KG edges by head in CSR form, then sample the fixed-size neighborhoods
+        :param kg_graph: entities x entities sparse matrix of the relations
+        :return: entities x neighbor_sample_size tensors of the sampled neighbors and relations
+        """
+        heads = np.concatenate([kg_graph.row, kg_graph.col]).astype(np.int64)
+        tails = np.concatenate([kg_graph.col, kg_graph.row]).astype(np.int64)
+        relations = np.concatenate([kg_graph.data, kg_graph.data]).astype(np.int64)
+        order = np.argsort(heads, kind='stable')
+        self.neighbor_tails, self.neighbor_relations = tails[order], relations[order]
+        self.degree = np.bincount(heads, minlength=kg_graph.shape[0])
+        self.neighbor_indptr = np.concatenate([[0], np.cumsum(self.degree)])
+        return self.sample_adj()
+
+    def sample_adj(self):
+        """
+        Sample neighbor_sample_size neighbors of every entity, without replacement when it has enough neighbors.
+        Entities without neighbors are linked to themselves with relation 0
+        """
+        entity_num, n = len(self.degree), self.neighbor_sample_size
+        start, degree = self.neighbor_indptr[:-1], self.degree
+        positions = np.empty([entity_num, n], dtype=np.int64)
+
+        # with replacement
+        rows = np.flatnonzero((degree > 0) & (degree < n))
+        positions[rows] = start[rows, None] + (np.random.random_sample([len(rows), n]) * degree[rows, None]).astype(np.int64)
+
+        # without replacement: the first n neighbors of each entity, after shuffling them with random keys
+        rows = np.flatnonzero(degree >= n)
+        row_start = np.concatenate([[0], np.cumsum(degree[rows])])
+        edges = np.repeat(start[rows] - row_start[:-1], degree[rows]) + np.arange(row_start[-1])
+        # the integer part keeps the edges of each entity together
+        keys = np.repeat(np.arange(len(rows)), degree[rows]) + np.random.random_sample(row_start[-1])
+        shuffled = edges[np.argsort(keys)]
+        positions[rows] = shuffled[row_start[:-1, None] + np.arange(n)]
+
+        isolated = np.flatnonzero(degree == 0)
+        adj_entity = np.empty([entity_num, n], dtype=np.int64)
+        adj_relation = np.empty([entity_num, n], dtype=np.int64)
+        linked = np.flatnonzero(degree > 0)
+        adj_entity[linked] = self.neighbor_tails[positions[linked]]
+        adj_relation[linked] = self.neighbor_relations[positions[linked]]
+        adj_entity[isolated] = isolated[:, None]
+        adj_relation[isolated] = 0
 
         return torch.from_numpy(adj_entity), torch.from_numpy(adj_relation)
 
+    def resample_neighbors(self):
+        adj_entity, adj_relation = self.sample_adj()
+        self.adj_entity, self.adj_relation = adj_entity.to(self.device), adj_relation.to(self.device)
+
     def get_neighbors(self, items):
         items = torch.unsqueeze(items, dim=1)
         entities = [items]
@@ -225,10 +236,10 @@ class KGCNModel(torch.nn.Module, ABC):
     def train_step(self, batch):
         user, pos_item, neg_item = batch
 
-        user_e, pos_item_e = self.forward(torch.tensor(user[:, 0], dtype=torch.int64),
-                                          torch.tensor(pos_item[:, 0], dtype=torch.int64))
-        user_e, neg_item_e = self.forward(torch.tensor(user[:, 0], dtype=torch.int64),
-                                          torch.tensor(neg_item[:, 0], dtype=torch.int64))
+        user_e, pos_item_e = self.forward(torch.as_tensor(user[:, 0], dtype=torch.int64),
+                                          torch.as_tensor(pos_item[:, 0], dtype=torch.int64))
+        user_e, neg_item_e = self.forward(torch.as_tensor(user[:, 0], dtype=torch.int64),
+                                          torch.as_tensor(neg_item[:, 0], dtype=torch.int64))
 
         pos_item_score = torch.mul(user_e, pos_item_e).sum(dim=1)
         neg_item_score = torch.mul(user_e, neg_item_e).sum(dim=1)
@@ -7,6 +7,7 @@ from elliot.recommender import BaseRecommenderModel
 from elliot.recommender.base_recommender_model import init_charger
 from elliot.recommender.recommender_utils_mixin import RecMixin
 from elliot.dataset.samplers import custom_sampler as cs
+from elliot.utils.recommendation_block import RecommendationBlock
 
 from .UserFeatureMapper import UserFeatureMapper
 from .KGFlexModel import KGFlexModel
@@ -27,6 +28,8 @@ class KGFlex(RecMixin, BaseRecommenderModel):
 
         if self._batch_size < 1:
             self._batch_size = self._data.transactions
+        # users scored at once when computing the recommendations
+        self._batch_eval = getattr(self._params, "batch_eval", 512)
 
         self._side = getattr(self._data.side_information, self._loader, None)
         self._sampler = cs.Sampler(self._data.i_train_dict)
@@ -73,18 +76,24 @@ class KGFlex(RecMixin, BaseRecommenderModel):
                + "_e:" + str(self._epochs) \
                + f"_{self.get_params_shortcut()}"
 
-    def get_single_recommendation(self, mask, k, *args):
-        return {u: self._model.get_user_recs(u, mask, k) for u in tqdm(self._data.users)}
+    def get_single_recommendation(self, mask, k, predictions, offset, offset_stop):
+        v, i = self._model.get_top_k(mask.mask(predictions, offset, offset_stop), k=k)
+        return RecommendationBlock(np.arange(offset, offset_stop), i, v,
+                                   self._data.private_users, self._data.private_items)
 
     def get_recommendations(self, k: int = 10):
-        predictions_top_k_val = {}
-        predictions_top_k_test = {}
-
-        recs_val, recs_test = self.process_protocol(k)
-        predictions_top_k_val.update(recs_val)
-        predictions_top_k_test.update(recs_test)
-
-        return predictions_top_k_val, predictions_top_k_test
+        predictions_top_k_val = []
+        predictions_top_k_test = []
+
+        for offset in tqdm(range(0, self._num_users, self._batch_eval), disable=not self._verbose):
+            offset_stop = min(offset + self._batch_eval, self._num_users)
+            predictions = self._model.predict(np.arange(offset, offset_stop))
+            recs_val, recs_test = self.process_protocol(k, predictions, offset, offset_stop)
+            predictions_top_k_val.append(recs_val)
+            predictions_top_k_test.append(recs_test)
+
+        return RecommendationBlock.concatenate(predictions_top_k_val), \
+               RecommendationBlock.concatenate(predictions_top_k_test)
 
     def train(self):
         if self._restore:
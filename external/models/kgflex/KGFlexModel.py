@@ -10,7 +10,15 @@ __email__ = 'vitowalter.anelli@poliba.it, antonio.ferrara@poliba.it, alberto.man
 import pickle
 
 import numpy as np
-from tqdm import tqdm
+import scipy.sparse as sp
+
+
+def expand_ranges(start, stop):
+    """
+    :return: concatenation of the ranges start[i]:stop[i]
+    """
+    lengths = stop - start
+    return np.arange(lengths.sum()) + np.repeat(start - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
 
 
 class KGFlexModel:
@@ -27,7 +35,7 @@ class KGFlexModel:
         self._learning_rate = learning_rate
         self._n_users = data.num_users
         self._n_items = data.num_items
-        self._users = data.private_users.keys()
+        self._users = range(self._n_users)
 
         self._n_features = n_features
         self._embedding_size = embedding_size
@@ -38,44 +46,60 @@ class KGFlexModel:
         self.Gb = np.random.randn(n_features) / 10
 
         # PERSONAL FEATURES
+        # personal features of all the users packed in one array, user u owns the rows offsets[u]:offsets[u + 1]
+        lengths = np.fromiter((len(user_features[u]) for u in self._users), dtype=np.int64, count=self._n_users)
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)])
         # personal feature embeddings
-        self.P_sp = {u: np.random.randn(len(user_features[u]), self._embedding_size) / 10
-                     for u in self._users}
+        self.P = np.random.randn(self.offsets[-1], self._embedding_size) / 10
         # personal feature weights
-        self.K_sp = {u: np.array([ig for ig in fs.values()]) for u, fs in user_features.items()}
+        self.K = np.fromiter((ig for u in self._users for ig in user_features[u].values()), dtype=np.float64,
+                             count=self.offsets[-1])
 
         # USER FEATURE MAPPING
-        # users features mask
-        self.Mu = np.zeros(shape=(self._n_users, n_features)).astype(bool)
-        for u, f in user_features.items():
-            self.Mu[u][list(map(feature_key_mapping.get, f))] = True
-        # item features mask
-        self.Mi = np.zeros(shape=(self._n_items, n_features)).astype(np.bool)
-        for i, row in enumerate(self.Mi):
-            self.Mi[i][list(map(feature_key_mapping.get, item_features[i]))] = True
-
-        # mapping global features indexing into user personal feature indexing
-        u_ft_idx = {u: dict(zip(map(feature_key_mapping.get, uf_), range(len(uf_)))) for u, uf_ in
-                    user_features.items()}
-
-        # user item features
-        self._n_features_range = np.array(range(self._n_features))
-
-        self.user_item_features = {u: {i: self._n_features_range[np.multiply(mu, mi)] for i, mi in enumerate(self.Mi)}
-                                   for u, mu in tqdm(enumerate(self.Mu), desc='user-item features', total=len(self.Mu))}
-
-        self.user_item_feature_idxs = {u: {i: list(map(u_ft_idx[u].get, f)) for i, f in its.items()} for u, its in
-                                       tqdm(self.user_item_features.items(), desc='user-item features indexed',
-                                            total=len(self.user_item_features))}
+        # users x features incidence matrix, together with the personal row of each of its entries
+        feature_ids = np.fromiter((feature_key_mapping[f] for u in self._users for f in user_features[u]),
+                                  dtype=np.int64, count=self.offsets[-1])
+        user_ids = np.repeat(np.arange(self._n_users), lengths)
+        self.user_rows = np.lexsort((feature_ids, user_ids))
+        self.Mu = sp.csr_matrix((np.ones(len(feature_ids)), feature_ids[self.user_rows], self.offsets),
+                                shape=(self._n_users, n_features))
+        # items x features incidence matrix
+        item_lengths = [len(item_features[i]) for i in range(self._n_items)]
+        self.Mi = sp.csr_matrix((np.ones(sum(item_lengths)),
+                                 (np.repeat(np.arange(self._n_items), item_lengths),
+                                  [feature_key_mapping[f] for i in range(self._n_items) for f in item_features[i]])),
+                                shape=(self._n_items, n_features))
+        self.Mi.sort_indices()
+        self._index_user_features()
+
+    def _index_user_features(self):
+        # sorted (user, feature) keys of the entries of Mu
+        self._user_keys = np.repeat(np.arange(self._n_users), np.diff(self.Mu.indptr)) * self._n_features + \
+            self.Mu.indices
+
+    def features(self, users, items):
+        """
+        Sparse intersection of the user and item features of a batch of (user, item) pairs
+        :return: (pair, global feature, personal feature row) flat arrays, sorted by pair and feature
+        """
+        users, items = np.asarray(users, dtype=np.int64), np.asarray(items, dtype=np.int64)
+        start, stop = self.Mi.indptr[items], self.Mi.indptr[items + 1]
+        pairs = np.repeat(np.arange(len(items)), stop - start)
+        f = self.Mi.indices[expand_ranges(start, stop)]
+        keys = users[pairs] * self._n_features + f
+        if not len(self._user_keys):
+            return pairs[:0], f[:0], f[:0]
+        position = np.minimum(np.searchsorted(self._user_keys, keys), len(self._user_keys) - 1)
+        found = self._user_keys[position] == keys
+        return pairs[found], f[found], self.user_rows[position[found]]
+
+    def feature_interactions(self, f, rows):
+        return (np.sum(np.multiply(self.P[rows], self.Gf[f]), axis=1) + self.Gb[f]) * self.K[rows]
 
     def __call__(self, *inputs):
         user, item = inputs
-        user, item = np.array(user), np.array(item)
-        return np.array(
-            [np.sum((np.sum(
-                np.multiply(self.P_sp[u][self.user_item_feature_idxs[u][i]], self.Gf[self.user_item_features[u][i]]),
-                axis=1) + self.Gb[self.user_item_features[u][i]]) * self.K_sp[u][self.user_item_feature_idxs[u][i]])
-             for u, i in zip(user, item)])
+        pairs, f, rows = self.features(user, item)
+        return np.bincount(pairs, weights=self.feature_interactions(f, rows), minlength=len(item))
 
     def train_step(self, batch):
 
@@ -83,66 +107,56 @@ class KGFlexModel:
         user = user[:, 0]
         pos = pos[:, 0]
         neg = neg[:, 0]
-        x_p = self(user, pos)
-        x_n = self(user, neg)
+        pairs_p, f_p, f_p_sp = self.features(user, pos)
+        pairs_n, f_n, f_n_sp = self.features(user, neg)
+        x_p = np.bincount(pairs_p, weights=self.feature_interactions(f_p, f_p_sp), minlength=len(user))
+        x_n = np.bincount(pairs_n, weights=self.feature_interactions(f_n, f_n_sp), minlength=len(user))
         x_pn = np.subtract(x_p, x_n)
         e = np.exp(-x_pn)
         loss = np.sum(1 + e)
         d_loss = e / (1 + e)
 
-        for us_, d_loss_, p, n in zip(user, d_loss, pos, neg):
-            f_p = self.user_item_features[us_][p]
-            f_n = self.user_item_features[us_][n]
-
-            if len(f_n) > 0:
-
-                f_p_sp = self.user_item_feature_idxs[us_][p]
-                f_n_sp = self.user_item_feature_idxs[us_][n]
+        # samples whose negative item shares no feature with the user are not updated
+        updated = np.bincount(pairs_n, minlength=len(user)) > 0
+        keep_p, keep_n = updated[pairs_p], updated[pairs_n]
+        f = np.concatenate([f_p[keep_p], f_n[keep_n]])
+        f_sp = np.concatenate([f_p_sp[keep_p], f_n_sp[keep_n]])
+        term = np.concatenate([d_loss[pairs_p[keep_p]], -d_loss[pairs_n[keep_n]]]) * self.K[f_sp] * self._learning_rate
 
-                p_term = d_loss_ * self.K_sp[us_][f_p_sp] * self._learning_rate
-                n_term = -d_loss_ * self.K_sp[us_][f_n_sp] * self._learning_rate
-
-                # updates
-                self.P_sp[us_][f_p_sp] += self.Gf[f_p] * p_term[:, np.newaxis]
-                self.Gf[f_p] += self.P_sp[us_][f_p_sp] * p_term[:, np.newaxis]
-                self.Gb[f_p] += p_term
-
-                self.P_sp[us_][f_n_sp] += self.Gf[f_n] * n_term[:, np.newaxis]
-                self.Gf[f_n] += self.P_sp[us_][f_n_sp] * n_term[:, np.newaxis]
-                self.Gb[f_n] += n_term
-            else:
-                pass
+        # updates, computed with the parameters before the batch and accumulated over repeated features
+        delta_p = self.Gf[f] * term[:, np.newaxis]
+        delta_gf = self.P[f_sp] * term[:, np.newaxis]
+        np.add.at(self.P, f_sp, delta_p)
+        np.add.at(self.Gf, f, delta_gf)
+        np.add.at(self.Gb, f, term)
 
         return loss
 
-    def predict(self, user):
-
-        eval_items = list(range(self._n_items))
-
-        p = self.P_sp[user]
-        gf = self.Gf[self.Mu[user]]
-        gb = self.Gb[self.Mu[user]]
-        k = self.K_sp[user]
-
-        f_interactions = (np.sum(np.multiply(p, gf), axis=1) + gb) * k
-
-        return np.array([np.sum(f_interactions[self.user_item_feature_idxs[user][i]]) for i in eval_items])
-
-    def get_user_recs(self, u, mask, k):
-        user_id = self._data.public_users.get(u)
-        user_recs = self.predict(user_id)
-        user_recs_mask = mask[user_id]
-        user_recs[~user_recs_mask] = -np.inf
-        indices, values = zip(*[(self._data.private_items.get(u_list[0]), u_list[1])
-                                for u_list in enumerate(user_recs)])
-        indices = np.array(indices)
-        values = np.array(values)
-        local_k = min(k, len(values))
-        partially_ordered_preds_indices = np.argpartition(values, -local_k)[-local_k:]
-        real_values = values[partially_ordered_preds_indices]
-        real_indices = indices[partially_ordered_preds_indices]
-        local_top_k = real_values.argsort()[::-1]
-        return [(real_indices[item], real_values[item]) for item in local_top_k]
+    def predict(self, users):
+        """
+        Score all the items for a batch of users, as the product of the sparse users x features interactions
+        and the item features incidence matrix
+        :param users: private user ids
+        :return: users x items scores
+        """
+        users = np.asarray(users, dtype=np.int64)
+        start, stop = self.Mu.indptr[users], self.Mu.indptr[users + 1]
+        positions = expand_ranges(start, stop)
+        f, rows = self.Mu.indices[positions], self.user_rows[positions]
+        interactions = sp.csr_matrix((self.feature_interactions(f, rows), f,
+                                      np.concatenate([[0], np.cumsum(stop - start)])),
+                                     shape=(len(users), self._n_features))
+        return interactions.dot(self.Mi.T).toarray()
+
+    def get_top_k(self, preds, k=100):
+        """
+        :return: (values, indices) of the k highest scores of each row, in decreasing order
+        """
+        k = min(k, preds.shape[1])
+        indices = np.argpartition(-preds, k - 1, axis=1)[:, :k]
+        values = np.take_along_axis(preds, indices, axis=1)
+        order = np.argsort(-values, axis=1, kind='stable')
+        return np.take_along_axis(values, order, axis=1), np.take_along_axis(indices, order, axis=1)
 
     def get_config(self):
         raise NotImplementedError
@@ -152,8 +166,10 @@ class KGFlexModel:
             '_global_features': self.Gf,
             '_global_bias': self.Gb,
             '_user_feature_mask': self.Mu,
-            '_user_feature_embeddings': self.P_sp,
-            '_user_feature_weights': self.K_sp,
+            '_user_feature_rows': self.user_rows,
+            '_user_feature_offsets': self.offsets,
+            '_user_feature_embeddings': self.P,
+            '_user_feature_weights': self.K,
             '_item_feature_mask': self.Mi}
         return saving_dict
 
@@ -162,8 +178,11 @@ class KGFlexModel:
         self.Gb = saving_dict['_global_bias']
         self.Mu = saving_dict['_user_feature_mask']
         self.Mi = saving_dict['_item_feature_mask']
-        self.P_sp = saving_dict['_user_feature_embeddings']
-        self.K_sp = saving_dict['_user_feature_weights']
+        self.user_rows = saving_dict['_user_feature_rows']
+        self.offsets = saving_dict['_user_feature_offsets']
+        self.P = saving_dict['_user_feature_embeddings']
+        self.K = saving_dict['_user_feature_weights']
+        self._index_user_features()
 
     def load_weights(self, path):
         with open(path, "rb") as f:
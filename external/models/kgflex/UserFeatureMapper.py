@@ -1,17 +1,39 @@
 import random
 import math
 import multiprocessing as mp
+import numpy as np
+import scipy.sparse as sp
 # mp.set_start_method('fork')
 from tqdm import tqdm
 from itertools import islice
 from operator import itemgetter
 from collections import OrderedDict, Counter
 
+from .KGFlexModel import expand_ranges
 
-def worker(user, user_items, neg_items, item_features, limit, seed):
-    random.seed(seed)
-    counter = user_features_counter(user_items, neg_items, item_features)
-    return user, limited_selection(counter, limit)
+
+# worker state, set once per process by init_worker
+_item_features = None
+_user_items = None
+_features = None
+_limit = None
+
+
+def init_worker(item_features, user_items, features, limit):
+    """
+    :param item_features: items x features CSR matrix
+    :param user_items: users x items CSR matrix of the training interactions
+    :param features: feature of each column of item_features
+    :param limit: maximum number of features per user
+    """
+    global _item_features, _user_items, _features, _limit
+    _item_features, _user_items, _features, _limit = item_features, user_items, features, limit
+
+
+def worker(user, seed):
+    positives = _user_items.indices[_user_items.indptr[user]: _user_items.indptr[user + 1]]
+    counter = sparse_features_counter(positives, _item_features, _features, np.random.RandomState(seed))
+    return user, limited_selection(counter, _limit)
 
 
 class UserFeatureMapper:
@@ -30,16 +52,22 @@ class UserFeatureMapper:
         self.user_features = self.user_features_selected_mp()
 
     def user_features_selected_mp(self):
-        def args():
-            return ((u,
-                     set(self._data.i_train_dict[u].keys()),
-                     set.difference(self._items, set(self._data.i_train_dict[u].keys())),
-                     self._item_features,
-                     self._max_features_per_user,
-                     random.randint(0, 100000)) for u in self._users)
-
-        arguments = args()
-        with mp.Pool(processes=mp.cpu_count()) as pool:
+        # the item features and the training interactions are sent once to each process,
+        # while each task only carries a user and its seed
+        features = list(dict.fromkeys(f for fs in self._item_features.values() for f in fs))
+        feature_idx = dict(zip(features, range(len(features))))
+        n_items = len(self._items)
+        item_lengths = [len(self._item_features.get(i, ())) for i in range(n_items)]
+        feature_ids = [feature_idx[f] for i in range(n_items) for f in self._item_features.get(i, ())]
+        item_features = sp.csr_matrix((np.ones(len(feature_ids), dtype=np.int64),
+                                       (np.repeat(np.arange(n_items), item_lengths), feature_ids)),
+                                      shape=(n_items, len(features)))
+        user_items = sp.csr_matrix(self._data.sp_i_train)
+        user_items.sort_indices()
+
+        arguments = [(u, random.randint(0, 100000)) for u in self._users]
+        with mp.Pool(processes=mp.cpu_count(), initializer=init_worker,
+                     initargs=(item_features, user_items, features, self._max_features_per_user)) as pool:
             results = pool.starmap(worker, tqdm(arguments, desc='user features selection', total=len(self._users)))
         return {u: f for u, f in results}
 
@@ -82,6 +110,35 @@ def user_features_counter(user_items, neg_items, item_features_):
     return pos_c, neg_c, len(positives)
 
 
+def sparse_features_counter(positives, item_features, features, random_state):
+    """
+    Count the features of the positive items and of as many negative items, drawn with replacement
+    among the items the user did not interact with, as sums of rows of the item features matrix
+    :param positives: sorted positive items
+    :param item_features: items x features CSR matrix
+    :param features: feature of each column of item_features
+    :return: Counter, Counter, number of positive items
+    """
+    n_items = item_features.shape[0]
+    negatives = random_state.randint(n_items, size=len(positives))
+    if len(positives) < n_items:
+        rejected = np.flatnonzero(np.isin(negatives, positives))
+        while len(rejected):
+            negatives[rejected] = random_state.randint(n_items, size=len(rejected))
+            rejected = rejected[np.isin(negatives[rejected], positives)]
+
+    def feature_columns(items):
+        return item_features.indices[expand_ranges(item_features.indptr[items], item_features.indptr[items + 1])]
+
+    # only the features of the positive items are scored
+    columns, pos_counts = np.unique(feature_columns(positives), return_counts=True)
+    neg_counts = np.bincount(feature_columns(negatives), minlength=item_features.shape[1])[columns]
+    columns = [features[f] for f in columns.tolist()]
+    pos_c = Counter(dict(zip(columns, pos_counts.tolist())))
+    neg_c = Counter({f: c for f, c in zip(columns, neg_counts.tolist()) if c})
+    return pos_c, neg_c, len(positives)
+
+
 def features_entropy(pos_counter, neg_counter, counter):
     """
     :param pos_counter: number of times in which feature is true and target is true
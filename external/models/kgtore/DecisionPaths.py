@@ -4,11 +4,9 @@ def warn(*args, **kwargs):
 import warnings
 warnings.warn = warn
 
-import pickle
 import torch_sparse
 from sklearn.tree import DecisionTreeClassifier
 import random
-import scipy
 from scipy.sparse import csr_matrix
 import os.path
 import pandas as pd
@@ -17,7 +15,7 @@ import torch
 import numpy as np
 from torch_sparse import SparseTensor
 import multiprocessing as mp
-from collections import Counter
+from multiprocessing import shared_memory
 
 # mp.set_start_method('fork')
 
@@ -26,7 +24,7 @@ seed = 0
 
 class DecisionPaths:
     def __init__(self, interactions, u_i_dict, kg, public_items, public_users, transaction, device, df_name, npr=10,
-                 criterion='entropy'):
+                 criterion='entropy', shared_features=False):
         self.interactions = interactions
         self.public_items = public_items
         self.public_users = public_users
@@ -36,6 +34,7 @@ class DecisionPaths:
         self.npr = npr
         self.criterion = criterion
         self.dataset_name = df_name
+        self.shared_features = shared_features
         self._feature_to_private = None
         self.i_f = None
         self.train_dict = None
@@ -51,18 +50,6 @@ class DecisionPaths:
         features_map.to_csv(dataset_path, sep='\t', header=False, index=False)
         print(f'Mapped features stored at {dataset_path}')
 
-    def save_edge_features_df(self, edge_feature_df):
-        name = 'decision_path' + str(self.npr) + "_" + str(self.criterion) + ".tsv"
-        dataset_path = os.path.abspath(os.path.join('./data', self.dataset_name, 'kgtore', name))
-        edge_feature_df.to_csv(dataset_path, sep='\t', header=False, index=False)
-
-    def save_item_features(self):
-        # store item features
-        item_feature_name = 'item_features' + str(self.npr) + "_" + str(self.criterion) + ".pk"
-        item_features_path = os.path.abspath(os.path.join('./data', self.dataset_name, 'kgtore', item_feature_name))
-        with open(item_features_path, 'wb') as file:
-            pickle.dump(self.item_features, file)
-
     def build_if(self, kg):
         i_f = kg
         i_f['subject'] = i_f['subject'].map(self.public_items)
@@ -75,57 +62,62 @@ class DecisionPaths:
         self.private_to_feature = {priv: pub for pub, priv in self._feature_to_private.items()}
         # self._data.i_train_dict = {u1: {i1: rating, i2:rating, ..}, u2: {ix:rating, ..}}
 
-    def create_edge_features_matrix(self):
-        edge_features = pd.DataFrame(self.edge_features)
-        edge_features.columns = ['user', 'item', 'feature']
-        edge_features['val'] = np.sign(edge_features['feature'])
-        features_to_store = edge_features.copy()
+    def create_edge_features_matrix(self, interaction, feature):
+        users = np.repeat(np.fromiter(self.u_i_dict.keys(), dtype=np.int64),
+                          [len(v) for v in self.u_i_dict.values()])
+        items = np.concatenate([np.asarray(v, dtype=np.int64) for v in self.u_i_dict.values()])
+        user, item = users[interaction], items[interaction]
+        sign = np.sign(feature)
+        feature = np.abs(feature)
+
+        # new feature indices follow the order of first appearance within the decision paths
+        unique_features, first_seen, inverse = np.unique(feature, return_index=True, return_inverse=True)
+        order = np.argsort(first_seen, kind='stable')
+        unique_features = unique_features[order]
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        new_feature = rank[inverse.ravel()]
+
         if self._store_features_flag:
-            features_to_store['feature'] = np.abs(features_to_store['feature'])
             private_items = {i: k for k, i in self.public_items.items()}
-            features_to_store['feature'] = features_to_store['feature'].map(self.private_to_feature)
-            features_to_store['public_item'] = features_to_store['item'].map(private_items)
+            features_to_store = pd.DataFrame({'user': user, 'item': item,
+                                              'feature': pd.Series(feature).map(self.private_to_feature),
+                                              'val': sign,
+                                              'public_item': pd.Series(item).map(private_items)})
             self.save_mapped_features(features_to_store)
 
-        edge_features['feature'] = np.abs(edge_features['feature'])
-        new_mapping = {p: pnew for pnew, p in enumerate(edge_features['feature'].unique())}
-        edge_features['feature'] = edge_features['feature'].map(new_mapping)
-        private_to_feature = {p: f for f, p in self._feature_to_private.items()}
-        feature_to_private = {private_to_feature[p]: pnew for p, pnew in new_mapping.items()}
-        # feature_to_private = {f: new_mapping[p] for f, p in self._feature_to_private.items()}
-        self._feature_to_private = feature_to_private
-        # reindex by interaction
-        indices = edge_features.groupby(['user', 'item']).size().reset_index(name='Freq')
-        index_list = [i for i in indices.index for z in range(indices.iloc[i, -1])]
-        counted = Counter(index_list)
-        val2 = [v for i, v in counted.items() for z in range(v)]
-        edge_features['val'] = edge_features['val'] / val2
-        edge_features['interaction'] = index_list
-        self.save_edge_features_df(edge_features)
-
-        # create item features with private items and mapped features
-        self.item_features = {i: {new_mapping[f] for f in ff if f in new_mapping} for i, ff in self.i_f.items()}
-        row_indices = [r for i in [[k] * len(v) for k, v in self.item_features.items()] for r in i]
-        col_indices = [r for i in [v for _, v in self.item_features.items()] for r in i]
-        self.item_features = torch_sparse.SparseTensor(row=torch.tensor(row_indices, dtype=torch.int64),
-                                  col=torch.tensor(col_indices, dtype=torch.int64),
-                                  value=torch.tensor([r for i in [torch.ones(len(v)) / len(v) for _, v in self.item_features.items()] for r in i], dtype=torch.float64))
-
-        # groups = edge_features[edge_features.val > 0][['item', 'feature']].groupby(['item'])
-        # self.item_features = dict(groups.apply(lambda x: set(x['feature'])))
+        self._feature_to_private = {self.private_to_feature[p]: pnew for pnew, p in enumerate(unique_features)}
 
-        self.save_item_features()
+        # each feature weighs 1 / (length of its decision path)
+        path_len = np.bincount(interaction, minlength=self.transaction)
+        val = sign / path_len[interaction]
 
-
-        self.edge_features = SparseTensor(row=torch.tensor(index_list, dtype=torch.int64),
-                                          col=torch.tensor(edge_features['feature'].astype(int).to_numpy(),
-                                                           dtype=torch.int64),
-                                          value=torch.tensor(edge_features['val'].astype(float).to_numpy(),
-                                                             dtype=torch.float32),
-                                          sparse_sizes=(self.transaction, edge_features['feature'].nunique())).to(
-            self.device)
+        # create item features with private items and mapped features
+        new_mapping = np.full(len(self.private_to_feature) + 1, -1)
+        new_mapping[unique_features] = np.arange(len(unique_features))
+        if_items = np.repeat(np.fromiter(self.i_f.keys(), dtype=np.int64), [len(v) for v in self.i_f.values()])
+        if_features = new_mapping[np.fromiter((f for v in self.i_f.values() for f in v), dtype=np.int64)]
+        kept = if_features >= 0
+        if_items, if_features = if_items[kept], if_features[kept]
+        if_len = np.bincount(if_items)
+        self.item_features = torch_sparse.SparseTensor(row=torch.from_numpy(if_items),
+                                                       col=torch.from_numpy(if_features),
+                                                       value=torch.from_numpy(1 / if_len[if_items]))
+
+        self.edge_features = SparseTensor(row=torch.from_numpy(interaction.astype(np.int64)),
+                                          col=torch.from_numpy(new_feature.astype(np.int64)),
+                                          value=torch.from_numpy(val.astype(np.float32)),
+                                          sparse_sizes=(self.transaction, len(unique_features))).to(self.device)
+
+    def item_features_csr(self):
+        items = np.repeat(np.fromiter(self.i_f.keys(), dtype=np.int64), [len(v) for v in self.i_f.values()])
+        features = np.fromiter((f for v in self.i_f.values() for f in v), dtype=np.int64)
+        return csr_matrix((np.ones(len(items), dtype=np.int8), (items, features)),
+                          shape=(items.max() + 1, len(self.private_to_feature) + 1))
 
     def build_decision_paths(self):
+        if self.shared_features:
+            return self.build_decision_paths_shared()
         criterion = self.criterion
         items = set(self.i_f.keys())
         npr = self.npr
@@ -140,10 +132,45 @@ class DecisionPaths:
             user_decision_paths = pool.starmap(user_decision_path, args)
 
         print("Building decision trees")
+        self.merge_decision_paths(user_decision_paths)
+
+    def build_decision_paths_shared(self):
+        """
+        Same as build_decision_paths, but the item x feature matrix is built once in shared memory
+        and the workers only receive the positive items of each user
+        """
+        i_f = self.item_features_csr()
+        blocks = [shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1)) for a in (i_f.indptr, i_f.indices)]
+        try:
+            layout = list()
+            for block, array in zip(blocks, (i_f.indptr, i_f.indices)):
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+                layout.append((block.name, array.shape, array.dtype.str))
+
+            print("Building decision trees")
+            args = ((self.u_i_dict[u], self.npr, self.criterion) for u in self.u_i_dict.keys())
+            n_procs = mp.cpu_count()-2
+            print(f'Running multiprocessing with {n_procs} processes on shared item features')
+
+            with mp.Pool(n_procs, initializer=attach_item_features, initargs=(layout, i_f.shape)) as pool:
+                user_decision_paths = pool.starmap(user_decision_path_shared, args)
+                # let the workers exit on their own, so that they close their shared memory handles
+                pool.close()
+                pool.join()
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
 
-        self.edge_features = [p for path in user_decision_paths for p in path]
-        self.create_edge_features_matrix()
+        print("Building decision trees")
+        self.merge_decision_paths(user_decision_paths)
 
+    def merge_decision_paths(self, user_decision_paths):
+        # positions are local to each user, shift them to the global interaction index
+        offsets = np.cumsum([0] + [len(v) for v in self.u_i_dict.values()])
+        interaction = np.concatenate([p + o for (p, _), o in zip(user_decision_paths, offsets)])
+        feature = np.concatenate([f for _, f in user_decision_paths])
+        self.create_edge_features_matrix(interaction, feature)
 
 
 def create_user_df(positive_items, negative_items, i_f, npr, random_seed=42):
@@ -170,33 +197,86 @@ def create_user_df(positive_items, negative_items, i_f, npr, random_seed=42):
     df['positive'] = df['item_id'].isin(positive_items).astype(int)
     return df
 
-def create_user_tree(df, npr, criterion):
+def create_user_tree(X, y, npr, criterion):
     clf = DecisionTreeClassifier(criterion=criterion, class_weight={1: npr, 0: 1}, random_state=seed)
-    X = csr_matrix(df.iloc[:, :-2].values)
-    y = df.iloc[:, -1].values
     clf.fit(X, y)
     return clf
 
 
-def retrieve_decision_paths(df, clf, u, user_i_dict):
-    full_positive_df = df.iloc[pd.Index(df['item_id']).get_indexer(user_i_dict)]
-    csr = scipy.sparse.csr_matrix(full_positive_df.iloc[:, :-2].values)
-    decision_path = clf.decision_path(csr)
-    u_dp = list()
-    for i in range(0, full_positive_df.shape[0]):
-        sample_no = i
-        dp_i = decision_path.indices[decision_path.indptr[sample_no]: decision_path.indptr[sample_no + 1]]
-        a = clf.tree_.feature[dp_i][clf.tree_.feature[dp_i] != -2]
-        feature_is_present = full_positive_df.iloc[sample_no, a]
-        feature_is_present = feature_is_present.replace(0, -1)
-        final_dp_feature = list(feature_is_present.index.astype(int) * feature_is_present)
-        u_dp.extend([[u, full_positive_df.iloc[sample_no, -2], j] for j in
-                     final_dp_feature])
-    return u_dp
+def retrieve_decision_paths(clf, X):
+    """
+    Extract the decision paths followed by every row of X in a single pass
+    :param clf: fitted decision tree
+    :param X: sparse samples x features matrix
+    :return: (sample, column, sign) arrays, one entry for each internal node crossed by a sample,
+    with sign +1 if the sample has the tested feature and -1 otherwise
+    """
+    decision_path = clf.decision_path(X)
+    sample = np.repeat(np.arange(X.shape[0]), np.diff(decision_path.indptr))
+    column = clf.tree_.feature[decision_path.indices]
+    internal = column >= 0
+    sample, column = sample[internal], column[internal]
+    is_present = np.asarray(X[sample, column]).ravel() != 0
+    return sample, column, np.where(is_present, 1, -1)
 
 
 def user_decision_path(user, user_items, user_i_dict, items: set, item_features: dict, npr, criterion):
     df = create_user_df(user_items, set.difference(items, user_items), item_features, npr)
-    clf = create_user_tree(df, npr, criterion)
-    u_dp = retrieve_decision_paths(df, clf, user, user_i_dict)
-    return u_dp
+    X = csr_matrix(df.iloc[:, :-2].values)
+    clf = create_user_tree(X, df['positive'].values, npr, criterion)
+    positives = pd.Index(df['item_id']).get_indexer(user_i_dict)
+    sample, column, sign = retrieve_decision_paths(clf, X[positives])
+    return sample, df.columns[:-2].values[column].astype(np.int64) * sign
+
+
+# item x feature matrix attached by every worker of the shared memory pool
+_shared_blocks = list()
+_shared_item_features = None
+_shared_items = None
+
+
+def attach_item_features(layout, shape):
+    global _shared_item_features, _shared_items
+    # run when the worker exits
+    mp.util.Finalize(None, detach_item_features, exitpriority=10)
+    arrays = list()
+    for name, array_shape, dtype in layout:
+        block = shared_memory.SharedMemory(name=name)
+        _shared_blocks.append(block)
+        arrays.append(np.ndarray(array_shape, dtype=dtype, buffer=block.buf))
+    indptr, indices = arrays
+    _shared_item_features = csr_matrix((np.ones(len(indices), dtype=np.int8), indices, indptr), shape=shape)
+    _shared_items = np.flatnonzero(np.diff(indptr))
+
+
+def detach_item_features():
+    global _shared_item_features, _shared_items
+    # the arrays viewing the blocks must go before the blocks are closed
+    _shared_item_features = _shared_items = None
+    while _shared_blocks:
+        _shared_blocks.pop().close()
+
+
+def sample_negative_items(positive_items, npr, random_seed=42):
+    random_state = np.random.RandomState(random_seed)
+    negative_items = np.setdiff1d(_shared_items, positive_items, assume_unique=True)
+    negatives_len = npr * len(positive_items)
+    if negatives_len <= len(negative_items):
+        return random_state.choice(negative_items, size=negatives_len, replace=False)
+    ratio = len(negative_items) // len(positive_items)
+    neg_items = random_state.choice(negative_items, size=ratio * len(positive_items), replace=False)
+    return np.concatenate([neg_items, random_state.choice(negative_items, size=negatives_len - len(neg_items))])
+
+
+def user_decision_path_shared(user_i_dict, npr, criterion):
+    positive_items = np.asarray(user_i_dict, dtype=np.int64)
+    all_items = np.concatenate([positive_items, sample_negative_items(positive_items, npr)])
+    _, first = np.unique(all_items, return_index=True)
+    all_items = all_items[np.sort(first)]
+
+    X = _shared_item_features[all_items]
+    columns = np.unique(X.indices)
+    X = X[:, columns]
+    clf = create_user_tree(X, (np.arange(len(all_items)) < len(positive_items)).astype(int), npr, criterion)
+    sample, column, sign = retrieve_decision_paths(clf, X[:len(positive_items)])
+    return sample, columns[column] * sign
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .LoadEdgeFeatures import LoadEdgeFeatures, StoreEdgeFeatures
+
+# bump when the decision path construction changes in a way that invalidates stored artifacts
+CACHE_VERSION = 1
+
+
+class DecisionPathsCache:
+    """
+    On-disk cache for the KGTORe decision paths.
+    Artifacts are stored in a directory named after a fingerprint of the training split, the knowledge graph
+    and the tree hyperparameters, so that trials and folds sharing a split reuse them, while a different split
+    can never load stale paths.
+    Entries use the columnar format of LoadEdgeFeatures.
+    """
+    def __init__(self, root, data, kg, **params):
+        self.params = params
+        self.key = self.fingerprint(data, kg, params)
+        self.path = os.path.abspath(os.path.join(root, self.key))
+
+    @staticmethod
+    def fingerprint(data, kg, params):
+        sha = hashlib.sha1()
+        sha.update(str(CACHE_VERSION).encode())
+        # training split, together with the public ids of private users and items
+        sp_i_train = data.sp_i_train.tocsr()
+        sha.update(np.asarray(sp_i_train.shape, dtype=np.int64).tobytes())
+        sha.update(sp_i_train.indptr.astype(np.int64).tobytes())
+        sha.update(sp_i_train.indices.astype(np.int64).tobytes())
+        sha.update(repr([data.private_users[u] for u in range(len(data.private_users))]).encode())
+        sha.update(repr([data.private_items[i] for i in range(len(data.private_items))]).encode())
+        # knowledge graph, as filtered by the loader
+        sha.update(pd.util.hash_pandas_object(kg[['subject', 'predicate', 'object']], index=False).values.tobytes())
+        # tree hyperparameters
+        sha.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return sha.hexdigest()
+
+    def exists(self):
+        manifest_path = os.path.join(self.path, 'manifest.json')
+        if not os.path.isfile(manifest_path):
+            return False
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+        # entries copied by hand under the key of another split or version are built again
+        return manifest.get('key') == self.key and manifest.get('version') == CACHE_VERSION
+
+    def load(self):
+        return LoadEdgeFeatures(self.path)
+
+    def store(self, edge_features, item_features, **manifest):
+        """
+        :param manifest: additional entries of the manifest (e.g. the source of converted decision paths)
+        """
+        parent = os.path.dirname(self.path)
+        os.makedirs(parent, exist_ok=True)
+        # write into a temporary directory first, so that concurrent runs never see a partial entry
+        tmp_path = tempfile.mkdtemp(dir=parent, prefix='.' + self.key)
+        StoreEdgeFeatures(tmp_path, edge_features, item_features,
+                          key=self.key, version=CACHE_VERSION, params=self.params, **manifest)
+        if os.path.isdir(self.path) and not self.exists():
+            # an invalid entry is replaced
+            shutil.rmtree(self.path, ignore_errors=True)
+        try:
+            os.rename(tmp_path, self.path)
+        except OSError:
+            # another run stored the same entry in the meantime
+            shutil.rmtree(tmp_path, ignore_errors=True)
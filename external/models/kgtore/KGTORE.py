@@ -5,13 +5,16 @@ import os
 
 
 from elliot.utils.write import store_recommendation
-from elliot.dataset.samplers import custom_sampler as cs
+from elliot.utils.artifact_cache import cached_artifact
+from elliot.utils.recommendation_block import RecommendationBlock
+from elliot.dataset.samplers import csr_sampler as cs
+from elliot.dataset.samplers.prefetch_sampler import PrefetchSampler
 from elliot.recommender import BaseRecommenderModel
 from elliot.recommender.base_recommender_model import init_charger
 from elliot.recommender.recommender_utils_mixin import RecMixin
 from .KGTOREModel import KGTOREModel
 from .DecisionPaths import DecisionPaths
-from .LoadEdgeFeatures import LoadEdgeFeatures
+from .DecisionPathsCache import DecisionPathsCache
 
 
 class KGTORE(RecMixin, BaseRecommenderModel):
@@ -19,6 +22,7 @@ class KGTORE(RecMixin, BaseRecommenderModel):
     def __init__(self, data, config, params, *args, **kwargs):
 
         self._sampler = cs.Sampler(self._data.i_train_dict)
+        self._sampler = PrefetchSampler.from_meta(self._sampler, self._params.meta, self._seed)
         if self._batch_size < 1:
             self._batch_size = self._num_users
 
@@ -40,41 +44,18 @@ class KGTORE(RecMixin, BaseRecommenderModel):
         ]
 
         self.autoset_params()
+        self._sampling = getattr(self._params, "sampling", "full")
+        if self._sampling not in ("full", "neighbor"):
+            raise Exception(f"KGTORe sampling must be 'full' or 'neighbor', found '{self._sampling}'")
         self._side = getattr(self._data.side_information, self._loader, None)
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
-        row, col = data.sp_i_train.nonzero()
-
-        try:
-            name = 'decision_path' + str(self._npr) + "_" + str(self._criterion) + ".tsv"
-            item_features_name = 'item_features' + str(self._npr) + "_" + str(self._criterion) + ".pk"
-            dataset_path = os.path.abspath(os.path.join('./data', config.dataset, 'kgtore', name))
-            item_features_path = os.path.abspath(os.path.join('./data', config.dataset, 'kgtore', item_features_name))
-            print(f'Looking for {dataset_path}')
-            print(f'Looking for {item_features_path}')
-            self.edge_features, self.item_features = LoadEdgeFeatures(dataset_path, item_features_path, self._data.transactions)
-            print("loaded edge features from: ", dataset_path, '\n')
-        except:
-            u_values, u_indices = np.unique(row, return_index=True)
-            u_indices = np.append(u_indices, len(col))
-            u_i_ordered_dict = {u_values[i]: col[u_indices[i]:u_indices[i + 1]] for i in range(len(u_values))}
-            Dec_Paths_class = DecisionPaths(interactions=data.i_train_dict,
-                                            u_i_dict=u_i_ordered_dict,
-                                            kg=self._side.feature_map,
-                                            public_items=data.public_items,
-                                            public_users=data.public_users,
-                                            transaction=self._data.transactions,
-                                            device=device,
-                                            df_name=config.dataset,
-                                            criterion=self._criterion,
-                                            npr=self._npr
-                                            )
-            self.edge_features = Dec_Paths_class.edge_features
-            self.item_features = Dec_Paths_class.item_features
-
-        col = [c + self._num_users for c in col]
-        self.edge_index = np.array([list(row) + col, col + list(row)])
-        self.num_interactions = row.shape[0]
+        # the decision paths and the graph only depend on the fold and on the tree parameters,
+        # so that they are built once for all the explored configurations
+        self.edge_features, self.item_features = cached_artifact(
+            data, ("KGTORE", "decision_paths", self._loader, self._npr, self._criterion),
+            lambda: self._build_decision_paths(data, config))
+        self.edge_index = cached_artifact(data, ("KGTORE", "edge_index"), self._build_edge_index)
+        self.num_interactions = self.edge_index.shape[1] // 2
 
         print(f'Number of KGTORE features: {self.edge_features.size(1)}')
 
@@ -97,9 +78,50 @@ class KGTORE(RecMixin, BaseRecommenderModel):
             edge_index=self.edge_index,
             edge_features=self.edge_features,
             item_features=self.item_features,
-            random_seed=self._seed
+            random_seed=self._seed,
+            sampling=self._sampling
         )
 
+    def _build_decision_paths(self, data, config):
+        shared_features = getattr(self._params.meta, "shared_features", False)
+        cache = DecisionPathsCache(os.path.join('./data', config.dataset, 'kgtore', 'cache'),
+                                   data, self._side.feature_map,
+                                   npr=self._npr, criterion=self._criterion, shared_features=shared_features)
+        if cache.exists():
+            edge_features, item_features = cache.load()
+            print("loaded edge features from: ", cache.path, '\n')
+        else:
+            print(f'No decision paths cached at {cache.path}')
+            row, col = data.sp_i_train.nonzero()
+            u_values, u_indices = np.unique(row, return_index=True)
+            u_indices = np.append(u_indices, len(col))
+            u_i_ordered_dict = {u_values[i]: col[u_indices[i]:u_indices[i + 1]] for i in range(len(u_values))}
+            Dec_Paths_class = DecisionPaths(interactions=data.i_train_dict,
+                                            u_i_dict=u_i_ordered_dict,
+                                            kg=self._side.feature_map.copy(),
+                                            public_items=data.public_items,
+                                            public_users=data.public_users,
+                                            transaction=self._data.transactions,
+                                            device=torch.device('cuda' if torch.cuda.is_available() else 'cpu'),
+                                            df_name=config.dataset,
+                                            criterion=self._criterion,
+                                            npr=self._npr,
+                                            shared_features=shared_features
+                                            )
+            edge_features = Dec_Paths_class.edge_features
+            item_features = Dec_Paths_class.item_features
+            cache.store(edge_features, item_features)
+            print("decision paths cached at: ", cache.path, '\n')
+        return edge_features, item_features
+
+    def _build_edge_index(self):
+        """
+        :return: [2, 2 * interactions] user-item edges in both directions, items following the users
+        """
+        row, col = self._data.sp_i_train.nonzero()
+        col = col + self._num_users
+        return np.array([np.concatenate([row, col]), np.concatenate([col, row])], dtype=np.int64)
+
     @property
     def name(self):
         return "KGTORE" \
@@ -123,22 +145,22 @@ class KGTORE(RecMixin, BaseRecommenderModel):
             self.evaluate(it, loss / (it + 1))
 
     def get_recommendations(self, k: int = 100):
-        predictions_top_k_test = {}
-        predictions_top_k_val = {}
+        predictions_top_k_test = []
+        predictions_top_k_val = []
         gu, gi = self._model.propagate_embeddings(evaluate=True)
         for index, offset in enumerate(range(0, self._num_users, self._batch_size)):
             offset_stop = min(offset + self._batch_size, self._num_users)
             predictions = self._model.predict(gu[offset: offset_stop], gi)
             recs_val, recs_test = self.process_protocol(k, predictions, offset, offset_stop)
-            predictions_top_k_val.update(recs_val)
-            predictions_top_k_test.update(recs_test)
-        return predictions_top_k_val, predictions_top_k_test
+            predictions_top_k_val.append(recs_val)
+            predictions_top_k_test.append(recs_test)
+        return RecommendationBlock.concatenate(predictions_top_k_val), \
+               RecommendationBlock.concatenate(predictions_top_k_test)
 
     def get_single_recommendation(self, mask, k, predictions, offset, offset_stop):
-        v, i = self._model.get_top_k(predictions, mask[offset: offset_stop], k=k)
-        items_ratings_pair = [list(zip(map(self._data.private_items.get, u_list[0]), u_list[1]))
-                              for u_list in list(zip(i.detach().cpu().numpy(), v.detach().cpu().numpy()))]
-        return dict(zip(map(self._data.private_users.get, range(offset, offset_stop)), items_ratings_pair))
+        v, i = self._model.get_top_k(mask.mask(predictions, offset, offset_stop), k=k)
+        return RecommendationBlock(np.arange(offset, offset_stop), i.detach().cpu().numpy(), v.detach().cpu().numpy(),
+                                   self._data.private_users, self._data.private_items)
 
     def evaluate(self, it=None, loss=0):
         if (it is None) or (not (it + 1) % self._validation_rate):
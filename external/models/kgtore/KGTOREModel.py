@@ -1,10 +1,8 @@
 from abc import ABC
-from .EdgeLayer import LGConv
 import torch
-import torch_geometric
 import numpy as np
 import random
-from torch_sparse import matmul
+from torch_sparse import SparseTensor, matmul
 from torch_scatter import scatter_add
 
 
@@ -26,6 +24,7 @@ class KGTOREModel(torch.nn.Module, ABC):
                  edge_features,
                  item_features,
                  random_seed,
+                 sampling='full',
                  name="KGTORE",
                  **kwargs
                  ):
@@ -50,6 +49,7 @@ class KGTOREModel(torch.nn.Module, ABC):
         self.l_w = l_w
         self.l_ind = l_ind
         self.n_layers = n_layers
+        self.sampling = sampling
         self.weight_size_list = [self.embedding_size] * (self.n_layers + 1)
         self.alpha = torch.tensor([1 / (k + 1) for k in range(len(self.weight_size_list))])
         self.edge_index = torch.tensor(edge_index, dtype=torch.int64, device=self.device)
@@ -84,10 +84,7 @@ class KGTOREModel(torch.nn.Module, ABC):
         self.F = torch.nn.Parameter(
             torch.nn.init.xavier_normal_(torch.empty((self.feature_dim, self.embedding_size))).to(self.device))
 
-        propagation_network_list = []
-        for layer in range(self.n_layers):
-            propagation_network_list.append((LGConv(alpha=self.a, beta=self.b), 'x, edge_index -> x'))
-        self.propagation_network = torch_geometric.nn.Sequential('x, edge_index', propagation_network_list).to(self.device)
+        self.adjacency, self.edge_propagation = self.build_propagation_matrices()
 
         self.softplus = torch.nn.Softplus()
 
@@ -98,44 +95,117 @@ class KGTOREModel(torch.nn.Module, ABC):
         self.n_selected_edges = int(self.num_interactions * self.ind_edges)
         self.l_ind = self.l_ind / self.ind_edges
 
-        self.edge_path = dict()
-        self.edge_len = dict()
-        for e in range(self.edge_features.size(0)):
-            self.edge_path[e] = self.edge_features[e].storage._col
-            self.edge_len[e] = len(self.edge_path[e])
-
+        # decision path of each edge as a padded (interactions x longest path) matrix of feature indices
+        row, col, _ = self.edge_features.coo()
+        self.edge_len = torch.bincount(row, minlength=self.edge_features.size(0))
+        position = torch.arange(row.size(0), device=self.device) - (torch.cumsum(self.edge_len, 0) - self.edge_len)[row]
+        self.edge_path = torch.zeros((self.edge_features.size(0), int(self.edge_len.max())), dtype=torch.int64,
+                                     device=self.device)
+        self.edge_path_mask = torch.zeros_like(self.edge_path, dtype=torch.bool)
+        self.edge_path[row, position] = col
+        self.edge_path_mask[row, position] = True
+
+    def build_propagation_matrices(self):
+        """
+        Precompute the sparse operators of the graph convolution, which only depend on the fixed graph
+        :return: adjacency (nodes x nodes) with the symmetric normalization and the beta/alpha scaling of the
+        user->item/item->user messages; edge propagation (nodes x features) aggregating the features of each
+        edge at its target node, weighted by edge_attr_weight and by (1 - beta)/(1 - alpha)
+        """
+        num_nodes = self.num_users + self.num_items
+        row, col = self.edge_index
+
+        # symmetric normalization (gcn_norm without self loops)
+        deg = scatter_add(torch.ones((self.edge_index.size(1), ), device=self.device), col, dim=0, dim_size=num_nodes)
+        deg_inv_sqrt = deg.pow(-0.5)
+        deg_inv_sqrt.masked_fill_(deg_inv_sqrt == float('inf'), 0)
+        scale = torch.full((self.edge_index.size(1), ), self.b, device=self.device)
+        scale[self.num_interactions:] = self.a
+        adjacency = SparseTensor(row=col, col=row, value=deg_inv_sqrt[row] * deg_inv_sqrt[col] * scale,
+                                 sparse_sizes=(num_nodes, num_nodes))
+
+        # user->item edges carry the features of their decision path
+        interactions = torch.arange(self.num_interactions, device=self.device)
+        ui_edges = SparseTensor(row=col[:self.num_interactions], col=interactions,
+                                value=self.edge_attr_weight[:self.num_interactions] * (1 - self.b),
+                                sparse_sizes=(num_nodes, self.num_interactions))
+        ui_features = matmul(ui_edges, self.edge_features)
+        # item->user edges carry the features of the item
+        iu_edges = SparseTensor(row=col[self.num_interactions:], col=self.items,
+                                value=torch.full((self.num_interactions, ), 1 - self.a, dtype=torch.float64,
+                                                 device=self.device),
+                                sparse_sizes=(num_nodes, self.item_features.size(0)))
+        iu_features = matmul(iu_edges, self.item_features)
+
+        # the two products cover disjoint rows (item and user nodes)
+        ui_row, ui_col, ui_value = ui_features.coo()
+        iu_row, iu_col, iu_value = iu_features.coo()
+        edge_propagation = SparseTensor(row=torch.cat([iu_row, ui_row]), col=torch.cat([iu_col, ui_col]),
+                                        value=torch.cat([iu_value, ui_value.to(iu_value.dtype)]).float(),
+                                        sparse_sizes=(num_nodes, self.feature_dim))
+        return adjacency, edge_propagation
 
     def propagate_embeddings(self, evaluate=False):
+        with torch.set_grad_enabled(not evaluate):
+            # the edge contribution is the same at every layer
+            edge_embeddings = matmul(self.edge_propagation, self.F)
+
+            ego_embeddings = torch.cat((self.Gu, self.Gi), 0).to(self.device)
+            all_embeddings = [ego_embeddings]
+            for layer in range(0, self.n_layers):
+                all_embeddings += [matmul(self.adjacency, all_embeddings[layer]) + edge_embeddings]
 
-        edge_embeddings_u_i = matmul(self.edge_features, self.F) * (1 - self.b)
-        edge_embeddings_i_u = matmul(self.item_features, self.F)[self.items] * (1-self.a)
-
-        ego_embeddings = torch.cat((self.Gu, self.Gi), 0).to(self.device)
-        all_embeddings = [ego_embeddings]
-        edge_embeddings = torch.cat([edge_embeddings_u_i, edge_embeddings_i_u], dim=0).to(self.device)
-
-        for layer in range(0, self.n_layers):
-            if evaluate:
-                self.propagation_network.eval()
-                with torch.no_grad():
-                    all_embeddings += [list(
-                        self.propagation_network.children())[layer](
-                        all_embeddings[layer], self.edge_index, edge_embeddings, self.edge_attr_weight)
-                    ]
-            else:
-                all_embeddings += [list(
-                    self.propagation_network.children())[layer](
-                    all_embeddings[layer], self.edge_index, edge_embeddings, self.edge_attr_weight)
-                ]
-
-        if evaluate:
-            self.propagation_network.train()
-
-        all_embeddings = sum([all_embeddings[k] * self.alpha[k] for k in range(len(all_embeddings))])
+            all_embeddings = sum([all_embeddings[k] * self.alpha[k] for k in range(len(all_embeddings))])
         gu, gi = torch.split(all_embeddings, [self.num_users, self.num_items], 0)
 
         return gu.to(self.device), gi.to(self.device)
 
+    def computation_subgraph(self, nodes):
+        """
+        Find the nodes whose embeddings are needed to propagate the embeddings of the given nodes
+        :param nodes: target nodes
+        :return: list of n_layers + 1 node tensors, hop l holds the nodes reached within l hops;
+        every hop starts with the nodes of the previous one, in the same order
+        """
+        hops = [nodes]
+        for _ in range(self.n_layers):
+            neighbors = torch.unique(self.adjacency.index_select(0, hops[-1]).coo()[1])
+            # the last hop holds all the nodes reached so far
+            hops.append(torch.cat([hops[-1], neighbors[~torch.isin(neighbors, hops[-1])]]))
+        return hops
+
+    def node_embeddings(self, nodes):
+        """
+        :param nodes: users and items offset by num_users
+        :return: ego embeddings of the given nodes, gathered from the user and item tables
+        """
+        is_user = (nodes < self.num_users).unsqueeze(-1)
+        return torch.where(is_user, self.Gu[nodes.clamp(max=self.num_users - 1)],
+                           self.Gi[(nodes - self.num_users).clamp(min=0)])
+
+    def propagate_subgraph(self, nodes):
+        """
+        Propagate the embeddings over the computation subgraph of the given nodes only
+        :param nodes: target nodes (users and items offset by num_users)
+        :return: final embeddings of the target nodes
+        """
+        hops = self.computation_subgraph(nodes)
+
+        ego_embeddings = self.node_embeddings(hops[-1])
+        layer_embeddings = ego_embeddings
+        all_embeddings = ego_embeddings[:nodes.size(0)] * self.alpha[0]
+        for layer in range(1, self.n_layers + 1):
+            targets, sources = hops[-layer - 1], hops[-layer]
+            row, col, value = self.adjacency.index_select(0, targets).coo()
+            # position of each neighbor within the sources, all of them are there by construction
+            sorted_sources, order = torch.sort(sources)
+            adjacency = SparseTensor(row=row, col=order[torch.searchsorted(sorted_sources, col)], value=value,
+                                     sparse_sizes=(targets.size(0), sources.size(0)))
+            layer_embeddings = matmul(adjacency, layer_embeddings) + \
+                matmul(self.edge_propagation.index_select(0, targets), self.F)
+            all_embeddings = all_embeddings + layer_embeddings[:nodes.size(0)] * self.alpha[layer]
+        return all_embeddings
+
     def forward(self, inputs, **kwargs):
         gu, gi = inputs
         gamma_u = torch.squeeze(gu)
@@ -146,12 +216,31 @@ class KGTOREModel(torch.nn.Module, ABC):
     def predict(self, gu, gi, **kwargs):
         return torch.matmul(gu, torch.transpose(gi, 0, 1))
 
+    def independence_loss(self, edges):
+        """
+        Sum over the given edges of the absolute correlations between the embeddings of the features within
+        the same decision path (diagonal excluded), as torch.corrcoef on each path but computed on all paths at once
+        """
+        mask = self.edge_path_mask[edges]
+        x = self.F[self.edge_path[edges]]
+        x = (x - x.mean(-1, keepdim=True)) * mask.unsqueeze(-1)
+        x = x / x.norm(dim=-1, keepdim=True).clamp_min(1e-12)
+        corr = torch.matmul(x, x.transpose(1, 2)).clamp(-1, 1)
+        return torch.abs(corr).sum() - self.edge_len[edges].sum()
+
     def train_step(self, batch):
 
-        gu, gi = self.propagate_embeddings()
         user, pos, neg = batch
-        xu_pos = self.forward(inputs=(gu[user[:, 0]], gi[pos[:, 0]]))
-        xu_neg = self.forward(inputs=(gu[user[:, 0]], gi[neg[:, 0]]))
+        if self.sampling == 'neighbor':
+            user, pos, neg = (torch.as_tensor(b[:, 0], dtype=torch.int64, device=self.device) for b in batch)
+            nodes, inverse = torch.unique(torch.cat([user, pos + self.num_users, neg + self.num_users]),
+                                          return_inverse=True)
+            gu_batch, gi_pos, gi_neg = torch.split(self.propagate_subgraph(nodes)[inverse], user.size(0))
+        else:
+            gu, gi = self.propagate_embeddings()
+            gu_batch, gi_pos, gi_neg = gu[user[:, 0]], gi[pos[:, 0]], gi[neg[:, 0]]
+        xu_pos = self.forward(inputs=(gu_batch, gi_pos))
+        xu_neg = self.forward(inputs=(gu_batch, gi_neg))
         difference = torch.clamp(xu_pos - xu_neg, -80.0, 1e8)
         bpr_loss = torch.sum(self.softplus(-difference))
         reg_loss = self.l_w * (torch.norm(self.Gu, 2) +
@@ -160,9 +249,8 @@ class KGTOREModel(torch.nn.Module, ABC):
 
         # independence loss over the features within the same path
         if self.l_ind > 0:
-            selected_edges = random.sample(list(range(self.num_interactions)), self.n_selected_edges)
-            ind_loss = [torch.abs(torch.corrcoef(self.F[self.edge_path[e]])).sum() - self.edge_len[e] for e in selected_edges]
-            ind_loss = sum(ind_loss) / self.n_selected_edges * self.l_ind
+            selected_edges = torch.randperm(self.num_interactions, device=self.device)[:self.n_selected_edges]
+            ind_loss = self.independence_loss(selected_edges) / self.n_selected_edges * self.l_ind
 
         loss = bpr_loss + reg_loss
         self.optimizer.zero_grad()
@@ -178,6 +266,5 @@ class KGTOREModel(torch.nn.Module, ABC):
 
         return loss.detach().cpu().numpy()
 
-    def get_top_k(self, preds, train_mask, k=100):
-        return torch.topk(torch.where(torch.tensor(train_mask).to(self.device), preds.to(self.device),
-                                      torch.tensor(-np.inf).to(self.device)), k=k, sorted=True)
+    def get_top_k(self, preds, k=100):
+        return torch.topk(preds.to(self.device), k=k, sorted=True)
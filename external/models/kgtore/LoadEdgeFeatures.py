@@ -1,30 +1,91 @@
+import json
+import os
 import pickle
 
+import numpy as np
 import pandas as pd
 import torch
 from torch_sparse import SparseTensor
-import numpy as np
-from collections import Counter
 
-def LoadEdgeFeatures(path, item_features_path, transactions):
-    edge_features = pd.read_csv(path, sep='\t', header=None)
-    edge_features.columns = ['user', 'item', 'feature', 'val', 'interaction']
+# every sparse tensor is stored as three raw .npy columns: <name>_row.npy, <name>_col.npy, <name>_value.npy
+COLUMNS = ('row', 'col', 'value')
+
+
+def store_sparse(path, name, tensor):
+    row, col, value = tensor.coo()
+    store_columns(path, name, row.detach().cpu().numpy(), col.detach().cpu().numpy(), value.detach().cpu().numpy())
+    return {name: {'sparse_sizes': list(tensor.sparse_sizes())}}
+
+
+def store_columns(path, name, row, col, value):
+    for column, array in zip(COLUMNS, (row, col, value)):
+        np.save(os.path.join(path, f'{name}_{column}.npy'), array)
+
+
+def load_sparse(path, name, sparse_sizes):
+    # copy-on-write memory mapping: pages are read lazily and the arrays are writable for torch
+    row, col, value = (torch.from_numpy(np.load(os.path.join(path, f'{name}_{column}.npy'), mmap_mode='c'))
+                       for column in COLUMNS)
+    return SparseTensor(row=row, col=col, value=value, sparse_sizes=tuple(sparse_sizes), is_sorted=True)
+
+
+def LoadEdgeFeatures(path):
+    """
+    Load edge features and item features stored in columnar format
+    :param path: directory containing the .npy columns and the manifest
+    :return: (edge_features, item_features) sparse tensors
+    """
+    with open(os.path.join(path, 'manifest.json')) as file:
+        manifest = json.load(file)
+    edge_features = load_sparse(path, 'edge_features', manifest['edge_features']['sparse_sizes'])
     print('loading item features')
+    item_features = load_sparse(path, 'item_features', manifest['item_features']['sparse_sizes'])
+    print(f'item features loaded from \'{path}\'')
+    return edge_features, item_features
+
+
+def StoreEdgeFeatures(path, edge_features, item_features, **manifest):
+    manifest.update(store_sparse(path, 'edge_features', edge_features))
+    manifest.update(store_sparse(path, 'item_features', item_features))
+    with open(os.path.join(path, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=4, default=str)
+
+
+def convert_tsv(path, item_features_path, sp_i_train):
+    """
+    One-shot conversion of a decision path TSV and its pickled item features to sparse tensors.
+    The interaction column of the TSV follows the groupby order of the run that wrote it, which shifts whenever
+    a decision path is empty, so that each row is indexed again by its (user, item) pair in the training split
+    :param path: decision path TSV [user, item, feature, val, interaction], with private user and item ids
+    :param item_features_path: pickled item features SparseTensor
+    :param sp_i_train: users x items training matrix the decision paths were built on
+    :return: (edge_features, item_features) sparse tensors
+    """
+    # only the needed columns are parsed
+    edge_features = pd.read_csv(path, sep='\t', header=None, names=['user', 'item', 'feature', 'val', 'interaction'],
+                                usecols=['user', 'item', 'feature', 'val'],
+                                dtype={'user': np.int64, 'item': np.int64, 'feature': np.int64, 'val': np.float32})
+    user, item, feature, val = (edge_features[c].to_numpy() for c in ('user', 'item', 'feature', 'val'))
+    del edge_features
+
+    # training interactions in the order of the model edges, as sorted (user, item) keys
+    row, col = sp_i_train.nonzero()
+    n_items = sp_i_train.shape[1]
+    train_keys = row.astype(np.int64) * n_items + col
+    train_order = np.argsort(train_keys, kind='stable')
+    keys = user * n_items + item
+    position = np.minimum(np.searchsorted(train_keys[train_order], keys), len(train_keys) - 1)
+    found = (user < sp_i_train.shape[0]) & (item < n_items) & (train_keys[train_order][position] == keys)
+    if not found.all():
+        raise ValueError(f'{np.count_nonzero(~found)} decision path rows of {path} are not training interactions '
+                         f'of the dataset: they were built on a different split')
+    interaction = train_order[position]
+
     with open(item_features_path, 'rb') as file:
         item_features = pickle.load(file)
-    print(f'item features loaded from \'{item_features_path}\'')
-
-    # weighted tree order
-    #ss = edge_features.groupby(['user', 'item']).transform(
-    #     lambda x: (np.array(range(len(x), 0, -1)) / sum(np.array(range(len(x), 0, -1)))))
-    #edge_features['val'] = abs(edge_features['val'])
-    #edge_features['val'] = ss['val'] * edge_features['val']
-
-    # edge_features['val'] = abs(edge_features['val'])
-    print()
-    return SparseTensor(row=torch.tensor(edge_features['interaction'], dtype=torch.int64),
-                                      col=torch.tensor(edge_features['feature'].astype(int).to_numpy(),
-                                                       dtype=torch.int64),
-                                      value=torch.tensor(edge_features['val'].astype(float).to_numpy(),
-                                                         dtype=torch.float32),
-                                      sparse_sizes=(transactions, edge_features['feature'].nunique()),), item_features
+
+    order = np.lexsort((feature, interaction))
+    edge_features = SparseTensor(row=torch.from_numpy(interaction[order]), col=torch.from_numpy(feature[order]),
+                                 value=torch.from_numpy(val[order]),
+                                 sparse_sizes=(len(train_keys), int(feature.max(initial=-1)) + 1), is_sorted=True)
+    return edge_features, item_features
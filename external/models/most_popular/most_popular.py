@@ -68,8 +68,10 @@ class MostPop(RecMixin, BaseRecommenderModel):
                 r[u] = l
                 continue
 
+            # candidate items of the user, taken once from the mask
+            row = mask[u]
             for item, pop in sorted_pop_items.items():
-                if mask[u, item]:
+                if row[item]:
                     l.append((self._data.private_items[item], pop))
                 if len(l) >= k:
                     break